@@ -0,0 +1,296 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from piece_model import Color, Game, fen_to_packed, packed_to_fen
+from search import Searcher
+from transposition import TranspositionTable
+from fen_loader import fen_text
+from evaluation import evaluate_batch
+from pgn import read_pgn, parse_san, san, game_result, square_name
+
+# the columns of each kind of result, also the order of the CSV columns
+GAME_FIELDS = ("index", "event", "white", "black", "result", "plies", "checks", "mate", "white_blunders",
+               "black_blunders", "blunders", "error")
+POSITION_FIELDS = ("index", "line", "fen", "to_move", "legal_moves", "in_check", "static", "best_move", "score",
+                   "depth", "nodes", "error")
+
+# the searcher a worker process keeps between chunks, so its table is only allocated once
+_worker_state: dict = {}
+
+
+def _searcher(depth: int, nodes: int) -> Searcher:
+    # the worker's searcher with this run's limits, its table is emptied so a score does not depend on the
+    # positions the worker happened to search before
+    searcher = _worker_state.get("searcher")
+    if searcher is None:
+        searcher = _worker_state["searcher"] = Searcher(time_limit=None, table=TranspositionTable(megabytes=4))
+    searcher.max_depth = depth
+    searcher.node_limit = nodes
+    searcher.table.clear()
+    return searcher
+
+
+def analyze_game(record, depth: int = 3, nodes: int = 20000, blunder: int = 200, backend: str = "pieces") -> dict:
+    """
+    will replay a game and score every position it went through with the engine. A move is a blunder when the
+    score of the side that played it drops by at least the blunder margin compared to the engine's best move.
+
+    Parameters:
+        record (PgnGame): the game as read from a PGN file
+        depth (int): the deepest iteration the engine searches each position to
+        nodes (int): the engine's node budget for each position
+        blunder (int): the score drop in centipawns that makes a move a blunder
+        backend (str): the move generator the game runs on
+
+    Returns:
+        dict: the GAME_FIELDS of the game except index, with an error message and the rest empty when its FEN
+        tag is malformed or a move is not legal
+    """
+    headers = record.headers
+    row = {"event": headers.get("Event", "?"), "white": headers.get("White", "?"),
+           "black": headers.get("Black", "?"), "result": record.result, "plies": 0, "checks": 0, "mate": False,
+           "white_blunders": 0, "black_blunders": 0, "blunders": [], "error": ""}
+    fen = headers.get("FEN")
+    try:
+        game = Game.from_fen(fen, backend) if fen else Game(backend)
+    except ValueError as error:
+        row["error"] = f"bad FEN: {error}"
+        return row
+    moves = []
+    try:
+        for text in record.moves:
+            move = parse_san(game, text)
+            moves.append((move, san(game, move), game.current_player))
+            (y, x), (y2, x2) = move
+            game.move(game.get(y, x), y, x, y2, x2)
+            if game.check(game.current_player):
+                row["checks"] += 1
+    except ValueError as error:
+        row["error"] = f"ply {len(moves) + 1}: {error}"
+        return row
+    row["plies"] = len(moves)
+    row["mate"] = game_result(game) in ("1-0", "0-1")
+    # each position is searched once, walking back from the end, the score after a move is the negated score of
+    # the position it leads to
+    searcher = _searcher(depth, nodes)
+    after = searcher.search(game).score
+    for ply in range(len(moves), 0, -1):
+        game.undo(False)
+        before = searcher.search(game).score
+        move, text, color = moves[ply - 1]
+        if before + after >= blunder:
+            side = "white" if color == Color.WHITE else "black"
+            row[side + "_blunders"] += 1
+            row["blunders"].insert(0, f"{(ply + 1) // 2}{'.' if color == Color.WHITE else '...'}{text}")
+        after = before
+    return row
+
+
+def analyze_position(packed: bytes, depth: int = 3, nodes: int = 20000, backend: str = "pieces") -> dict:
+    """
+    will score a position with the engine
+
+    Parameters:
+        packed (bytes): the position as Game.pack writes it
+        depth (int): the deepest iteration the engine searches to
+        nodes (int): the engine's node budget
+        backend (str): the move generator the game runs on
+
+    Returns:
+        dict: the POSITION_FIELDS of the position except index, line and fen
+    """
+    game = Game.unpack(packed, backend)
+    color = game.current_player
+    result = _searcher(depth, nodes).search(game)
+    best = "" if result.move is None else square_name(*result.move[0]) + square_name(*result.move[1])
+    return {"to_move": color.name, "legal_moves": len(game.legal_moves(color)), "in_check": game.check(color),
+            "best_move": best, "score": result.score, "depth": result.depth, "nodes": result.nodes, "error": ""}
+
+
+def _analyze_chunk(kind: str, items: list, options: dict) -> list[dict]:
+    # runs in a worker process, items are (index, record) for games and (index, line, fen) for positions
+    rows = []
+    if kind == "games":
+        for index, record in items:
+            rows.append({"index": index, **analyze_game(record, **options)})
+    else:
+        options = {name: value for name, value in options.items() if name != "blunder"}
+        positions = []
+        for index, line, fen in items:
+            try:
+                positions.append((index, line, fen_to_packed(fen)))
+            except ValueError as error:
+                rows.append({"index": index, "line": line, "fen": fen, "error": f"bad FEN: {error}"})
+        # the material and square values of the whole chunk are worked out in one batch
+        statics = evaluate_batch([packed for _, _, packed in positions])
+        for (index, line, packed), static in zip(positions, statics):
+            rows.append({"index": index, "line": line, "fen": packed_to_fen(packed), "static": static,
+                         **analyze_position(packed, **options)})
+        rows.sort(key=lambda row: row["index"])
+    return rows
+
+
+def read_items(path: str):
+    """
+    will stream the work items of an input file, games from a file ending in .pgn and FEN positions otherwise
+
+    Parameters:
+        path (str): the file to read
+
+    Returns:
+        tuple[str,Iterator]: "games" or "positions" and an iterator over the numbered items. A position is only
+        parsed by the worker that analyzes it, so a malformed line becomes a row with its error instead of
+        stopping the run
+    """
+    if path.lower().endswith(".pgn"):
+        return "games", _stream(path, lambda file: enumerate(read_pgn(file)))
+    return "positions", _stream(path, lambda file: ((index, line, fen) for index, (line, fen) in
+                                                    enumerate(_fen_lines(file))))
+
+
+def _fen_lines(file):
+    # the line number and FEN of every line that holds one
+    for number, line in enumerate(file, 1):
+        fen = fen_text(line)
+        if fen:
+            yield number, fen
+
+
+def _stream(path: str, parse):
+    # keeps the file open only while its items are being read
+    with open(path) as file:
+        yield from parse(file)
+
+
+class Checkpoint:
+    """
+    How far a run has got: the number of items whose results were written and the size of the output file after
+    them. It is saved next to the output after every chunk, by writing a new file and renaming it over the old
+    one, so a crash leaves either the old or the new checkpoint and never half of one.
+
+    Attributes:
+        path (str): the checkpoint file
+        items (int): how many items are finished
+        size (int): the output file's size in bytes after the finished items
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Constructor that reads the checkpoint file when there is one
+
+        Parameters:
+            path (str): the checkpoint file
+        """
+        self.path = path
+        self.items = 0
+        self.size = 0
+        if os.path.exists(path):
+            with open(path) as file:
+                saved = json.load(file)
+            self.items, self.size = saved["items"], saved["size"]
+
+    def save(self, items: int, size: int) -> None:
+        """
+        will record a new position in the run
+
+        Parameters:
+            items (int): how many items are finished
+            size (int): the output file's size in bytes after them
+        """
+        self.items, self.size = items, size
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"items": items, "size": size}, file)
+        os.replace(temporary, self.path)
+
+
+def run(input_path: str, output_path: str, output_format: str = "jsonl", workers: int = None,
+        chunk_size: int = 16, resume: bool = False, progress=sys.stderr, **options) -> int:
+    """
+    will analyze every game or position of a file over a pool of worker processes. Items are sent out in chunks
+    with at most two chunks per worker waiting, so memory stays flat however big the input is, and the results
+    are written in input order as each chunk comes back.
+
+    With resume the run carries on from its checkpoint: the output is cut back to the last finished chunk and
+    the items before it are skipped.
+
+    Parameters:
+        input_path (str): a .pgn file of games or a file of FEN lines
+        output_path (str): the results file
+        output_format (str): "jsonl" or "csv"
+        workers (int): the number of worker processes, one per core when not given
+        chunk_size (int): how many items a worker gets at a time
+        resume (bool): if the run should carry on from its checkpoint instead of starting over
+        progress: where progress lines are written, None for none
+        options: depth, nodes, blunder and backend for analyze_game and analyze_position
+
+    Returns:
+        int: the number of items that were analyzed, counting those of earlier runs
+    """
+    kind, items = read_items(input_path)
+    fields = GAME_FIELDS if kind == "games" else POSITION_FIELDS
+    checkpoint = Checkpoint(output_path + ".checkpoint")
+    if not resume:
+        checkpoint.save(0, 0)
+    with open(output_path, "a+", newline="") as output:
+        # anything written after the checkpoint belongs to a chunk that was not finished
+        output.truncate(checkpoint.size)
+        output.seek(checkpoint.size)
+        writer = csv.DictWriter(output, fields) if output_format == "csv" else None
+        if writer and checkpoint.size == 0:
+            writer.writeheader()
+        done = checkpoint.items
+        items = islice(items, done, None)
+        start = time.perf_counter()
+        started_at = done
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            while True:
+                while len(pending) < 2 * workers:
+                    chunk = list(islice(items, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(pool.submit(_analyze_chunk, kind, chunk, dict(options)))
+                if not pending:
+                    break
+                for row in pending.popleft().result():
+                    if writer:
+                        writer.writerow({**row, "blunders": " ".join(row["blunders"])} if kind == "games" else row)
+                    else:
+                        output.write(json.dumps(row) + "\n")
+                    done += 1
+                output.flush()
+                checkpoint.save(done, output.tell())
+                if progress:
+                    elapsed = time.perf_counter() - start
+                    rate = (done - started_at) / elapsed if elapsed else 0
+                    print(f"{done} {kind} analyzed  {elapsed:8.1f} s  {rate:6.2f} per second", file=progress)
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze a file of games or positions with the engine.")
+    parser.add_argument("input", help="a .pgn file of games or a file of FEN lines")
+    parser.add_argument("output", help="the results file")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="how results are written")
+    parser.add_argument("--workers", type=int, help="worker processes, one per core by default")
+    parser.add_argument("--chunk-size", type=int, default=16, help="items sent to a worker at a time")
+    parser.add_argument("--depth", type=int, default=3, help="the deepest search of each position")
+    parser.add_argument("--nodes", type=int, default=20000, help="the node budget of each position's search")
+    parser.add_argument("--blunder", type=int, default=200, help="centipawns a move must lose to be a blunder")
+    parser.add_argument("--backend", choices=Game.BACKENDS, default="pieces", help="the move generator to use")
+    parser.add_argument("--resume", action="store_true", help="carry on from the output's checkpoint")
+    args = parser.parse_args()
+    run(args.input, args.output, args.format, args.workers, args.chunk_size, args.resume, depth=args.depth,
+        nodes=args.nodes, blunder=args.blunder, backend=args.backend)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+from bitboard import Bitboards, PIECE_KINDS, PAWN, KNIGHT, KING, squares
+
+
+class AttackMap:
+    """
+    Which squares each color attacks or defends, kept up to date one move at a time. A square counts as attacked
+    by a piece when the piece could capture on it, so pawns attack their forward diagonals and a sliding piece
+    attacks everything up to and including the first piece in its way, whatever its color.
+
+    When a move changes some squares only the pieces standing on them and the sliding pieces whose rays pass
+    through them are looked at again, everything else on the board keeps its attacks.
+
+    Attributes:
+        _board (list[list]): the board the map follows, indexed as board[x][y] like Game's
+        _occupied (int): every occupied square as a bit set
+        _attacks (list[int]): the squares attacked by the piece on each square, 0 for empty squares
+        _colors (list[int]): the color value of the piece each entry of _attacks belongs to
+        _attackers (list[int]): the squares of the pieces attacking each square, of either color
+        _counts (tuple[list[int],list[int]]): how many pieces of each color value attack each square
+        _totals (list[int]): the sum of each color value's counts over the board
+    """
+
+    def __init__(self, board: list[list]) -> None:
+        """
+        Constructor that works out the attacks of every piece on the board
+
+        Parameters:
+            board (list[list]): the board to follow
+        """
+        self._board = board
+        self._occupied = 0
+        self._attacks: list[int] = [0] * 64
+        self._colors: list[int] = [-1] * 64
+        self._attackers: list[int] = [0] * 64
+        self._counts: tuple[list[int], list[int]] = ([0] * 64, [0] * 64)
+        self._totals: list[int] = [0, 0]
+        for x, col in enumerate(board):
+            for y, piece in enumerate(col):
+                if piece:
+                    self._occupied |= 1 << (y * 8 + x)
+        for sq in squares(self._occupied):
+            self._refresh(sq)
+
+    def attacked(self, sq: int, by: int) -> bool:
+        """
+        will determine if any piece of a color attacks a square
+
+        Parameters:
+            sq (int): the square number, y * 8 + x
+            by (int): the color value of the attacking side
+
+        Returns:
+            bool: if the square is attacked
+        """
+        return self._counts[by][sq] > 0
+
+    def count(self, sq: int, by: int) -> int:
+        """
+        will return how many pieces of a color attack a square
+
+        Parameters:
+            sq (int): the square number, y * 8 + x
+            by (int): the color value of the attacking side
+
+        Returns:
+            int: the number of attackers
+        """
+        return self._counts[by][sq]
+
+    def total(self, by: int) -> int:
+        """
+        will return how many attacks a color has over the whole board, a square attacked twice counts twice
+
+        Parameters:
+            by (int): the color value of the attacking side
+
+        Returns:
+            int: the number of attacks
+        """
+        return self._totals[by]
+
+    def attackers(self, sq: int) -> int:
+        """
+        will return the squares of every piece attacking a square
+
+        Parameters:
+            sq (int): the square number, y * 8 + x
+
+        Returns:
+            int: the attacking pieces' squares as a bit set
+        """
+        return self._attackers[sq]
+
+    def attacks(self, sq: int) -> int:
+        """
+        will return the squares the piece on a square attacks
+
+        Parameters:
+            sq (int): the square number, y * 8 + x
+
+        Returns:
+            int: the attacked squares as a bit set, 0 when the square is empty
+        """
+        return self._attacks[sq]
+
+    def update(self, *changed: int) -> None:
+        """
+        must be called after the board has changed, with every square whose piece was added, removed or replaced
+
+        Parameters:
+            changed (int): the square numbers that changed
+        """
+        affected = 0
+        changed_bits = 0
+        # the sliding pieces that reach a changed square may now see further or less far
+        for sq in changed:
+            affected |= self._attackers[sq]
+            changed_bits |= 1 << sq
+            y, x = divmod(sq, 8)
+            if self._board[x][y]:
+                self._occupied |= 1 << sq
+            else:
+                self._occupied &= ~(1 << sq)
+        for sq in changed:
+            self._refresh(sq)
+        for sq in squares(affected & ~changed_bits):
+            y, x = divmod(sq, 8)
+            if PIECE_KINDS[type(self._board[x][y])] not in (PAWN, KNIGHT, KING):
+                self._refresh(sq)
+
+    def _refresh(self, sq: int) -> None:
+        # works out the attacks of whatever is on the square now and applies the difference to the counts
+        y, x = divmod(sq, 8)
+        piece = self._board[x][y]
+        if piece:
+            color = piece.color.value
+            attacks = Bitboards.attacks_from(sq, PIECE_KINDS[type(piece)], color, self._occupied)
+        else:
+            color = -1
+            attacks = 0
+        old = self._attacks[sq]
+        old_color = self._colors[sq]
+        bit = 1 << sq
+        # only the squares that were gained or lost are touched when the color stays the same
+        if old_color == color:
+            removed, added = old & ~attacks, attacks & ~old
+        else:
+            removed, added = old, attacks
+        if removed:
+            counts = self._counts[old_color]
+            for target in squares(removed):
+                counts[target] -= 1
+                self._attackers[target] &= ~bit
+            self._totals[old_color] -= bin(removed).count("1")
+        if added:
+            counts = self._counts[color]
+            for target in squares(added):
+                counts[target] += 1
+                self._attackers[target] |= bit
+            self._totals[color] += bin(added).count("1")
+        self._attacks[sq] = attacks
+        self._colors[sq] = color
@@ -0,0 +1,480 @@
+from piece_model import Color, PIECE_KINDS, UNMOVED
+
+# index of each kind of piece in a Bitboards' piece lists, the same order as PIECE_CLASSES
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# every square of the board set
+FULL = (1 << 64) - 1
+
+# (y, x) step of each sliding direction, a square is y * 8 + x so the first four grow the square number
+DIRECTIONS = ((1, 0), (0, 1), (1, -1), (1, 1), (-1, 0), (0, -1), (-1, 1), (-1, -1))
+ORTHOGONAL = (0, 1, 4, 5)
+DIAGONAL = (2, 3, 6, 7)
+
+
+def square(y: int, x: int) -> int:
+    """
+    turns a board position into a bit index
+
+    Parameters:
+        y (int): the y position on the board
+        x (int): the x position on the board
+
+    Returns:
+        int: the square number from 0 (top left) to 63 (bottom right)
+    """
+    return y * 8 + x
+
+
+def coords(sq: int) -> tuple[int, int]:
+    """
+    turns a bit index back into a board position
+
+    Parameters:
+        sq (int): the square number
+
+    Returns:
+        tuple[int,int]: the (y, x) position of the square
+    """
+    return divmod(sq, 8)
+
+
+def squares(bits: int):
+    """
+    yields the square number of every set bit, lowest first
+
+    Parameters:
+        bits (int): a set of squares
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _step_table(steps: tuple) -> list[int]:
+    # for every square, the set of squares reached by taking each step once
+    table = []
+    for sq in range(64):
+        y, x = coords(sq)
+        bits = 0
+        for y_d, x_d in steps:
+            if 0 <= y + y_d <= 7 and 0 <= x + x_d <= 7:
+                bits |= 1 << square(y + y_d, x + x_d)
+        table.append(bits)
+    return table
+
+
+def _ray_table(y_d: int, x_d: int) -> list[int]:
+    # for every square, the set of squares from it to the edge of the board in one direction
+    table = []
+    for sq in range(64):
+        y, x = coords(sq)
+        bits = 0
+        y, x = y + y_d, x + x_d
+        while 0 <= y <= 7 and 0 <= x <= 7:
+            bits |= 1 << square(y, x)
+            y, x = y + y_d, x + x_d
+        table.append(bits)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2)))
+KING_ATTACKS = _step_table(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+# squares a pawn of each color captures on, white moves up the board and black moves down
+PAWN_ATTACKS = (_step_table(((-1, -1), (-1, 1))), _step_table(((1, -1), (1, 1))))
+RAYS = tuple(_ray_table(y_d, x_d) for y_d, x_d in DIRECTIONS)
+
+
+def _between_table() -> list[list[int]]:
+    # the squares strictly between two squares on one line, 0 when they are not on a line or are neighbours
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for direction in range(8):
+            for target in squares(RAYS[direction][sq]):
+                # the opposite direction is four along in DIRECTIONS
+                table[sq][target] = RAYS[direction][sq] & RAYS[(direction + 4) % 8][target]
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def sliding_attacks(sq: int, occupied: int, directions: tuple) -> int:
+    """
+    will find the squares a sliding piece on sq attacks. Each ray runs to the edge of the board and is cut after
+    the first occupied square, which is kept so that captures (and the own piece that blocks) are included.
+
+    Parameters:
+        sq (int): the square of the sliding piece
+        occupied (int): every occupied square on the board
+        directions (tuple): the indexes into RAYS to slide along
+
+    Returns:
+        attacks (int): the set of attacked squares
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            # the nearest blocker is the lowest bit on rays that grow the square number, the highest otherwise
+            if direction < 4:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+class Bitboards:
+    """
+    A position stored as 64 bit sets, one per color and kind of piece. It follows the same rules as the piece
+    classes: pawns move two squares while their first_move flag is set, they are promoted to a queen on the last
+    row, and there is no castling or en passant.
+
+    Attributes:
+        pieces (list[list[int]]): the squares of each kind of piece, indexed by color value and then kind
+        occupied (list[int]): the squares of each color, indexed by color value
+        unmoved (int): the squares of pawns that still have their first move
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor for an empty board
+        """
+        self.pieces: list[list[int]] = [[0] * 6, [0] * 6]
+        self.occupied: list[int] = [0, 0]
+        self.unmoved: int = 0
+
+    @classmethod
+    def from_pieces(cls, pieces) -> 'Bitboards':
+        """
+        will build the bit sets from a list of pieces and where they stand, which only visits the squares that
+        have a piece on them
+
+        Parameters:
+            pieces (Iterable[tuple[tuple[int,int],Piece]]): ((y, x), piece) pairs like Game.get_pieces gives
+
+        Returns:
+            Bitboards: the same position as bit sets
+        """
+        position = cls()
+        sets = position.pieces
+        occupied = position.occupied
+        for (y, x), piece in pieces:
+            bit = 1 << (y * 8 + x)
+            color = piece.color.value
+            kind = PIECE_KINDS[type(piece)]
+            sets[color][kind] |= bit
+            occupied[color] |= bit
+            if kind == PAWN and piece.first_move:
+                position.unmoved |= bit
+        return position
+
+    @classmethod
+    def from_squares(cls, data: bytes) -> 'Bitboards':
+        """
+        will build the bit sets from piece codes, one byte per square in y * 8 + x order like Game.pack writes
+
+        Parameters:
+            data (bytes): the codes of at least the 64 squares
+
+        Returns:
+            Bitboards: the same position as bit sets
+        """
+        position = cls()
+        pieces = position.pieces
+        for sq in range(64):
+            code = data[sq]
+            if code:
+                bit = 1 << sq
+                color, kind = divmod((code & ~UNMOVED) - 1, 6)
+                pieces[color][kind] |= bit
+                position.occupied[color] |= bit
+                if code & UNMOVED:
+                    position.unmoved |= bit
+        return position
+
+    def kind_at(self, sq: int, color: int) -> int:
+        """
+        will find which kind of piece of a color is on a square
+
+        Parameters:
+            sq (int): the square to look at
+            color (int): the color value of the piece
+
+        Returns:
+            int: the kind of the piece, or -1 when there is no piece of that color
+        """
+        bit = 1 << sq
+        for kind, bits in enumerate(self.pieces[color]):
+            if bits & bit:
+                return kind
+        return -1
+
+    @staticmethod
+    def attacks_from(sq: int, kind: int, color: int, occupied: int) -> int:
+        """
+        will find every square a piece attacks, including squares holding pieces of its own color
+
+        Parameters:
+            sq (int): the square of the piece
+            kind (int): the kind of the piece
+            color (int): the color value of the piece
+            occupied (int): every occupied square on the board
+
+        Returns:
+            int: the set of attacked squares
+        """
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        if kind == KING:
+            return KING_ATTACKS[sq]
+        if kind == PAWN:
+            return PAWN_ATTACKS[color][sq]
+        if kind == ROOK:
+            return sliding_attacks(sq, occupied, ORTHOGONAL)
+        if kind == BISHOP:
+            return sliding_attacks(sq, occupied, DIAGONAL)
+        return sliding_attacks(sq, occupied, ORTHOGONAL + DIAGONAL)
+
+    def targets(self, sq: int, kind: int, color: int) -> int:
+        """
+        will find the squares a piece can move to, the same squares its piece class' valid_moves returns
+
+        Parameters:
+            sq (int): the square of the piece
+            kind (int): the kind of the piece
+            color (int): the color value of the piece
+
+        Returns:
+            int: the set of squares the piece can move to
+        """
+        own = self.occupied[color]
+        enemy = self.occupied[1 - color]
+        if kind != PAWN:
+            return self.attacks_from(sq, kind, color, own | enemy) & ~own
+        empty = ~(own | enemy) & FULL
+        bit = 1 << sq
+        if color == Color.WHITE.value:
+            push = (bit >> 8) & empty
+            if push and bit & self.unmoved:
+                push |= (push >> 8) & empty
+        else:
+            push = (bit << 8) & empty
+            if push and bit & self.unmoved:
+                push |= (push << 8) & empty
+        return push | (PAWN_ATTACKS[color][sq] & enemy)
+
+    def valid_moves(self, y: int, x: int) -> list[tuple[int, int]]:
+        """
+        will return the moves for the piece at a given location in the same form as the piece classes
+
+        Parameters:
+            y (int): the y coordinate of the piece
+            x (int): the x coordinate of the piece
+
+        Returns:
+            moves (list[tuple[int,int]]): the (y, x) positions the piece can move to
+        """
+        sq = square(y, x)
+        for color in (0, 1):
+            kind = self.kind_at(sq, color)
+            if kind != -1:
+                return [coords(to) for to in squares(self.targets(sq, kind, color))]
+        return []
+
+    def attacked(self, sq: int, by: int, occupied: int = -1, pieces: list[int] = None) -> bool:
+        """
+        will determine if any piece of a color attacks a square
+
+        Parameters:
+            sq (int): the square to test
+            by (int): the color value of the attacking side
+            occupied (int): the occupied squares to slide through, the current board when not given
+            pieces (list[int]): the attacking side's sets by kind, the current ones when not given
+
+        Returns:
+            bool: if the square is attacked
+        """
+        if pieces is None:
+            pieces = self.pieces[by]
+        if occupied == -1:
+            occupied = self.occupied[0] | self.occupied[1]
+        if KNIGHT_ATTACKS[sq] & pieces[KNIGHT] or KING_ATTACKS[sq] & pieces[KING]:
+            return True
+        # a pawn of the attacking color hits sq from the squares a pawn of the other color would capture on
+        if PAWN_ATTACKS[1 - by][sq] & pieces[PAWN]:
+            return True
+        if sliding_attacks(sq, occupied, ORTHOGONAL) & (pieces[ROOK] | pieces[QUEEN]):
+            return True
+        return bool(sliding_attacks(sq, occupied, DIAGONAL) & (pieces[BISHOP] | pieces[QUEEN]))
+
+    def checkers(self, color: Color) -> int:
+        """
+        will find the enemy pieces giving check to the king of a color
+
+        Parameters:
+            color (Color): which king to test
+
+        Returns:
+            int: the squares of the checking pieces, 0 when there is no king of that color
+        """
+        king = self.pieces[color.value][KING]
+        if not king:
+            return 0
+        sq = king.bit_length() - 1
+        enemy = self.pieces[1 - color.value]
+        occupied = self.occupied[0] | self.occupied[1]
+        return ((KNIGHT_ATTACKS[sq] & enemy[KNIGHT]) | (KING_ATTACKS[sq] & enemy[KING])
+                | (PAWN_ATTACKS[color.value][sq] & enemy[PAWN])
+                | (sliding_attacks(sq, occupied, ORTHOGONAL) & (enemy[ROOK] | enemy[QUEEN]))
+                | (sliding_attacks(sq, occupied, DIAGONAL) & (enemy[BISHOP] | enemy[QUEEN])))
+
+    def pins(self, color: Color) -> dict[int, int]:
+        """
+        will find the pieces of a color that may not leave the line between their king and an enemy sliding piece
+
+        Parameters:
+            color (Color): the color of the pinned pieces
+
+        Returns:
+            dict[int,int]: the squares each pinned piece may still move to, the line up to and including the
+            pinning piece, by the pinned piece's square
+        """
+        pinned = {}
+        king = self.pieces[color.value][KING]
+        if not king:
+            return pinned
+        sq = king.bit_length() - 1
+        own = self.occupied[color.value]
+        occupied = own | self.occupied[1 - color.value]
+        enemy = self.pieces[1 - color.value]
+        for direction in range(8):
+            blockers = RAYS[direction][sq] & occupied
+            if not blockers:
+                continue
+            first = blockers & -blockers if direction < 4 else 1 << (blockers.bit_length() - 1)
+            blockers ^= first
+            if not first & own or not blockers:
+                continue
+            second = blockers & -blockers if direction < 4 else 1 << (blockers.bit_length() - 1)
+            sliders = enemy[QUEEN] | (enemy[ROOK] if direction in ORTHOGONAL else enemy[BISHOP])
+            if second & sliders:
+                pinner = second.bit_length() - 1
+                pinned[first.bit_length() - 1] = BETWEEN[sq][pinner] | second
+        return pinned
+
+    def legal_masks(self, color: Color) -> tuple[int, int, int, dict[int, int]]:
+        """
+        will work out where the pieces of a color may legally go without trying a move. The king may go to any
+        square the enemy does not attack once the king is off the board, in double check nothing else helps, in
+        single check the other pieces must capture the checker or block its line, and a pinned piece has to stay
+        on its pin line. Without castling or en passant these rules are all there is to legality.
+
+        Parameters:
+            color (Color): the side to move
+
+        Returns:
+            tuple[int,int,int,dict[int,int]]: the king's square, -1 when there is no king, the squares the king
+            may move to, the squares the other pieces may move to, and the pin lines by pinned square
+        """
+        side = color.value
+        king = self.pieces[side][KING]
+        if not king:
+            # with no king to protect every move the piece classes allow is legal
+            return -1, 0, FULL, {}
+        sq = king.bit_length() - 1
+        own = self.occupied[side]
+        without_king = (own | self.occupied[1 - side]) & ~king
+        safe = 0
+        for to in squares(KING_ATTACKS[sq] & ~own):
+            if not self.attacked(to, 1 - side, without_king):
+                safe |= 1 << to
+        checkers = self.checkers(color)
+        if checkers & (checkers - 1):
+            return sq, safe, 0, {}
+        allowed = checkers | BETWEEN[sq][checkers.bit_length() - 1] if checkers else FULL
+        return sq, safe, allowed, self.pins(color)
+
+    def has_legal_move(self, color: Color) -> bool:
+        """
+        will determine if a color has any legal move without trying one, see legal_masks
+
+        Parameters:
+            color (Color): the side to move
+
+        Returns:
+            bool: if there is at least one legal move
+        """
+        king, safe, allowed, pinned = self.legal_masks(color)
+        if safe:
+            return True
+        side = color.value
+        if allowed:
+            for kind in range(KING):
+                for frm in squares(self.pieces[side][kind]):
+                    if self.targets(frm, kind, side) & allowed & pinned.get(frm, FULL):
+                        return True
+        return False
+
+    def in_check(self, color: Color) -> bool:
+        """
+        will determine if the king of a color is attacked
+
+        Parameters:
+            color (Color): which king to test
+
+        Returns:
+            bool: if the king is in check, false when there is no king of that color
+        """
+        king = self.pieces[color.value][KING]
+        if not king:
+            return False
+        return self.attacked(king.bit_length() - 1, 1 - color.value)
+
+    def pseudo_moves(self, color: Color) -> list[tuple[int, int]]:
+        """
+        will return every move of a color that the piece classes allow, even if it leaves its own king in check
+
+        Parameters:
+            color (Color): the side to generate moves for
+
+        Returns:
+            moves (list[tuple[int,int]]): (from square, to square) pairs
+        """
+        moves = []
+        side = color.value
+        for kind, bits in enumerate(self.pieces[side]):
+            for frm in squares(bits):
+                moves += [(frm, to) for to in squares(self.targets(frm, kind, side))]
+        return moves
+
+    def legal_moves(self, color: Color, captures: bool = False) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+        """
+        will return every move of a color that Game.move would accept, which is every move of the piece classes
+        that does not leave the color's king in check. The targets of each piece are cut down by legal_masks, so
+        only legal moves are generated and none has to be played to be tested.
+
+        Parameters:
+            color (Color): the side to generate moves for
+            captures (bool): if only the moves that take an enemy piece are wanted
+
+        Returns:
+            moves (list[tuple[tuple[int,int],tuple[int,int]]]): ((y, x), (y2, x2)) pairs
+        """
+        king, safe, allowed, pinned = self.legal_masks(color)
+        moves = []
+        side = color.value
+        if captures:
+            safe &= self.occupied[1 - side]
+            allowed &= self.occupied[1 - side]
+        for kind, bits in enumerate(self.pieces[side]):
+            for frm in squares(bits):
+                mask = safe if frm == king else allowed & pinned.get(frm, FULL)
+                if mask:
+                    start = coords(frm)
+                    moves += [(start, coords(to)) for to in squares(self.targets(frm, kind, side) & mask)]
+        return moves
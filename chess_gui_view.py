@@ -1,15 +1,46 @@
+import argparse
+import threading
+import time
+from collections import deque
 import pygame as pg
 import pygame_gui as gui
 from piece_model import *
+from opening_book import OpeningBook
+from tablebase import Tablebases
+from parallel_search import ParallelSearcher
+from profiling import PROFILER
+
+# posted by the search thread when the computer has picked its move
+COMPUTER_MOVED = pg.event.custom_type()
+# the part of the window the side panel's elements are drawn in
+PANEL_RECT = pg.Rect((1000, 50), (400, 600))
+# where the frame time overlay is written
+OVERLAY_RECT = pg.Rect((1000, 660), (400, 24))
+# where the profiling counters are written, one line each
+PROFILE_RECT = pg.Rect((1000, 690), (420, 180))
+PROFILE_LINE = 20
+# the frame length while something moves on screen, and how long after the last event the window keeps drawing
+# frames so the ui's hover and press transitions can finish
+FRAME_MS = 1000 // 30
+SETTLE_MS = 500
 
 
 class GUI:
-    def __init__(self) -> None:
+    def __init__(self, show_frame_times: bool = False, book: str = None, tablebases: str = None,
+                 show_profile: bool = False, workers: int = None) -> None:
         pg.init()
         self._game = Game()
+        # the computer searches its root moves in that many worker processes, with the default engine's budget
+        if workers:
+            self._game.engine = ParallelSearcher(workers, max_depth=64, time_limit=1.0)
+        # the computer answers the openings it knows from the book file without searching
+        if book:
+            self._game.engine.book = OpeningBook(book)
+        # and plays the endings that are solved in the tables directory perfectly
+        if tablebases:
+            self._game.engine.tablebases = Tablebases(tablebases)
         self._screen = pg.display.set_mode((1440, 900))
         pg.display.set_caption("Laker Chess")
-        self._pieces = pg.image.load("./images/pieces.png")
         self._ui_manager = gui.UIManager((1440, 900))
         self._side_box = gui.elements.UITextBox('<b>Laker Chess</b><br /><br />White moves first.<br />', relative_rect=pg.Rect((1000, 100), (400, 500)),
                                  manager=self._ui_manager)
@@ -20,17 +51,66 @@ class GUI:
         self._piece_selected = False
         self._first_selected = (0, 0)
         self._second_selected = (0, 0)
-        self._valid_moves = []
+        self._valid_moves = frozenset()
+        # the board without pieces or outlines, drawn once and copied from for every square that changes
+        self._board_surface = self.__render_board__()
+        # what each square showed when it was last drawn, indexed as y * 8 + x, None forces a redraw
+        self._drawn: list = [None] * 64
+        self._full_redraw = True
+        self._thinking_label = gui.elements.UILabel(relative_rect=pg.Rect((1000, 610), (400, 40)), text='',
+                                                    manager=self._ui_manager)
+        # the thread searching for the computer's move, and the number of the search whose answer is awaited
+        self._search_thread = None
+        self._search_token = 0
+        self._thinking_since = 0
+        # the render cost of the latest frames in milliseconds, shown in the overlay that F3 turns on and off
+        self._show_frame_times = show_frame_times
+        self._frame_times = deque(maxlen=30)
+        self._frames_drawn = 0
+        self._overlay_font = pg.font.Font(None, 22)
+        # the hot path counters, shown in the overlay that F4 turns on and off. They are only counted while shown
+        self._show_profile = False
+        self._profile_font = pg.font.Font(None, 18)
+        if show_profile:
+            self.__toggle_profile__()
 
     def run_game(self) -> None:
         running: bool = True
         time_delta = 0
         clock = pg.time.Clock()
+        last_event = pg.time.get_ticks()
         while running:
-            for event in pg.event.get():
+            # sleeps until something happens, or only until the next frame while the computer thinks or the ui
+            # is still changing
+            if self._search_thread or pg.time.get_ticks() - last_event < SETTLE_MS:
+                first = pg.event.wait(FRAME_MS)
+            else:
+                first = pg.event.wait()
+            events = [] if first.type == pg.NOEVENT else [first] + pg.event.get()
+            if events:
+                last_event = pg.time.get_ticks()
+            for event in events:
+                self._ui_manager.process_events(event)
                 if event.type == pg.QUIT:
                     running = False
-                if event.type == pg.MOUSEBUTTONDOWN:
+                if event.type in (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED):
+                    self._full_redraw = True
+                if event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                    self._show_frame_times = not self._show_frame_times
+                    self._full_redraw = True
+                if event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                    self.__toggle_profile__()
+                if event.type == COMPUTER_MOVED and event.token == self._search_token:
+                    self._search_thread = None
+                    self._thinking_label.set_text('')
+                    if event.error is not None or event.result is None:
+                        self._side_box.append_html_text(f'The computer could not move: {event.error}<br />')
+                        continue
+                    computer_message = self._game._computer_move(event.result)
+                    if computer_message:
+                        self._side_box.append_html_text(computer_message)
+                    self.__report_check__()
+                if event.type == pg.MOUSEBUTTONDOWN and not self._search_thread:
                     x, y = pg.mouse.get_pos()
                     y, x = self.__get_coords__(y, x)
                     piece = self._game.get(y, x)
@@ -39,7 +119,7 @@ class GUI:
                             continue
                         self._piece_selected = True
                         self._first_selected = y, x
-                        self._valid_moves = piece.valid_moves(y, x)
+                        self._valid_moves = frozenset(self._game.legal_moves_from(y, x))
                         self._piece_selected = piece
                     elif self._piece_selected and (y, x) in self._valid_moves:
                         target = self._game.get(y, x)
@@ -50,68 +130,201 @@ class GUI:
                             if target:
                                 self._side_box.append_html_text(' and captures ' + str(type(target).__name__))
                             self._side_box.append_html_text('<br />')
-                            computer_message = self._game._computer_move()
-                            if computer_message:
-                                self._side_box.append_html_text(computer_message)
+                            self.__start_computer_move__()
                         else:
                             self._side_box.append_html_text('Invalid move.  Would leave '
                                                             + str(self._piece_selected.color.name) + ' in check.<br />')
-                        if self._game.check(Color.WHITE):
-                            self._side_box.append_html_text("WHITE is in CHECK!<br />")
-                        if self._game.check(Color.BLACK):
-                            self._side_box.append_html_text("BLACK is in CHECK!<br />")
-                        if self._game.mate(Color.WHITE):
-                            self._side_box.append_html_text("WHITE is in CHECKMATE!<br />GAME OVER!")
-                        if self._game.mate(Color.BLACK):
-                            self._side_box.append_html_text("BLACK is in CHECKMATE!<br />GAME OVER!")
+                            self.__report_check__()
                         self._piece_selected = False
                     else:
                         self._piece_selected = False
                 if event.type == gui.UI_BUTTON_PRESSED:
                     if event.ui_element == self._restart_button:
+                        self.__cancel_computer_move__()
                         self._game.reset()
                         self._side_box.set_text("Restarting game...<br />")
                     if event.ui_element == self._undo_button:
-                        if self._game.undo():
+                        # while the computer thinks only the player's own move is taken back
+                        if self.__cancel_computer_move__():
+                            self._game.undo(False)
+                            self._side_box.append_html_text('Undoing move.<br />')
+                        elif self._game.undo():
                             self._side_box.append_html_text('Undoing move.<br />')
                         else:
                             self._side_box.append_html_text('Nothing to undo.<br />')
-            self._ui_manager.process_events(event)
-            self._screen.fill((255, 255, 255))
-            self.__draw_board__()
-            self._ui_manager.draw_ui(self._screen)
+            if self._search_thread:
+                dots = (pg.time.get_ticks() - self._thinking_since) // 400 % 4
+                self._thinking_label.set_text('BLACK is thinking' + '.' * dots)
             self._ui_manager.update(time_delta)
-            pg.display.flip()
-            time_delta = clock.tick(30) / 1000.0
+            start = time.perf_counter()
+            dirty = self.__draw_board__()
+            self._screen.fill((255, 255, 255), PANEL_RECT)
+            self._ui_manager.draw_ui(self._screen)
+            if self._show_frame_times:
+                self.__draw_frame_times__()
+                dirty.append(OVERLAY_RECT)
+            if self._show_profile:
+                self.__draw_profile__()
+                dirty.append(PROFILE_RECT)
+            if self._full_redraw:
+                self._full_redraw = False
+                pg.display.flip()
+            else:
+                dirty.append(PANEL_RECT)
+                pg.display.update(dirty)
+            self._frame_times.append((time.perf_counter() - start) * 1000)
+            self._frames_drawn += 1
+            time_delta = clock.tick() / 1000.0
+        # a search still running and the worker processes of a parallel engine end with the window
+        self.__cancel_computer_move__()
+        if isinstance(self._game.engine, ParallelSearcher):
+            self._game.engine.close()
+
+    def __start_computer_move__(self) -> None:
+        """
+        starts searching for the computer's move in a thread, on a copy of the game so the board can be drawn
+        while it searches. The move arrives as a COMPUTER_MOVED event.
+        """
+        self._search_token += 1
+        self._thinking_since = pg.time.get_ticks()
+        # a stop that came after the last search had already returned would end this one at once
+        self._game.engine.clear_stop()
+        self._search_thread = threading.Thread(target=self.__search__, daemon=True,
+                                               args=(self._game.engine, Game.unpack(self._game.pack()),
+                                                     self._search_token))
+        self._search_thread.start()
+
+    @staticmethod
+    def __search__(engine, game: Game, token: int) -> None:
+        # runs in the search thread, the event is posted even when the search fails so the gui stops waiting
+        result = error = None
+        try:
+            result = engine.search(game)
+        except Exception as exc:
+            error = exc
+        finally:
+            pg.event.post(pg.event.Event(COMPUTER_MOVED, result=result, error=error, token=token))
+
+    def __cancel_computer_move__(self) -> bool:
+        """
+        stops the computer's search if it is running, its move is never played
+
+        Returns:
+            bool: if a search was cancelled
+        """
+        if not self._search_thread:
+            return False
+        self._search_token += 1
+        # the engine is shared with the next search, so this one has to be finished first
+        self._game.engine.stop()
+        self._search_thread.join()
+        self._search_thread = None
+        self._thinking_label.set_text('')
+        return True
+
+    def __report_check__(self) -> None:
+        # tells the players about checks, checkmates and drawn games
+        if self._game.check(Color.WHITE):
+            self._side_box.append_html_text("WHITE is in CHECK!<br />")
+        if self._game.check(Color.BLACK):
+            self._side_box.append_html_text("BLACK is in CHECK!<br />")
+        outcome = self._game.outcome()
+        if outcome == Outcome.CHECKMATE:
+            self._side_box.append_html_text(self._game.current_player.name + " is in CHECKMATE!<br />GAME OVER!")
+        elif outcome != Outcome.ONGOING:
+            reason = outcome.name.replace("_", " ").lower()
+            self._side_box.append_html_text(f"Draw by {reason}.<br />GAME OVER!")
+
+    def __draw_frame_times__(self) -> None:
+        # writes the render cost of the previous frames over the bottom of the side panel
+        self._screen.fill((255, 255, 255), OVERLAY_RECT)
+        if not self._frame_times:
+            return
+        times = self._frame_times
+        text = (f"frame {times[-1]:.1f} ms  avg {sum(times) / len(times):.1f} ms  max {max(times):.1f} ms  "
+                f"{self._frames_drawn} drawn")
+        self._screen.blit(self._overlay_font.render(text, True, (0, 0, 0)), OVERLAY_RECT)
+
+    def __toggle_profile__(self) -> None:
+        # counting starts from zero when the overlay is shown and stops when it is hidden
+        self._show_profile = not self._show_profile
+        if self._show_profile:
+            PROFILER.reset()
+            PROFILER.enable()
+        else:
+            PROFILER.disable()
+        self._full_redraw = True
+
+    def __draw_profile__(self) -> None:
+        # writes the busiest hooked functions and the cache hit rates below the frame time overlay
+        self._screen.fill((255, 255, 255), PROFILE_RECT)
+        for number, line in enumerate(PROFILER.report_lines(limit=7)):
+            self._screen.blit(self._profile_font.render(line, True, (0, 0, 0)),
+                              (PROFILE_RECT.x, PROFILE_RECT.y + number * PROFILE_LINE))
 
     def __get_coords__(self, y, x):
         grid_x = x // 105
         grid_y = y // 105
         return grid_y, grid_x
 
-    def __draw_board__(self) -> None:
-        count = 0
-        color = (255, 255, 255)
+    def __render_board__(self) -> pg.Surface:
+        """
+        draws the empty board with its border lines
+
+        Returns:
+            pg.Surface: the board, as big as the board area of the window
+        """
+        surface = pg.Surface((841, 841))
+        surface.fill((255, 255, 255))
+        for y in range(0, 8):
+            for x in range(0, 8):
+                if (y + x) % 2:
+                    pg.draw.rect(surface, (127, 127, 127), pg.rect.Rect(x * 105, y * 105, 105, 105))
+        pg.draw.line(surface, (0, 0, 0), (0, 840), (840, 840))
+        pg.draw.line(surface, (0, 0, 0), (840, 840), (840, 0))
+        return surface
+
+    def __draw_board__(self) -> list:
+        """
+        draws the squares whose piece, selection or highlight changed since they were last drawn
+
+        Returns:
+            list[pg.Rect]: the parts of the window that were drawn on
+        """
+        if self._full_redraw:
+            self._screen.fill((255, 255, 255))
+            self._screen.blit(self._board_surface, (0, 0))
+            self._drawn = [None] * 64
+        selected = self._first_selected if self._piece_selected else None
+        valid_moves = self._valid_moves if self._piece_selected else ()
+        dirty = []
         for y in range(0, 8):
             for x in range(0, 8):
-                if count % 2 == 0:
-                    color = (255, 255, 255)
-                else:
-                    color = (127, 127, 127)
-                count = count + 1
-                pg.draw.rect(self._screen, color, pg.rect.Rect(x * 105, y * 105, 105, 105))
-                if self._piece_selected and (y, x) == self._first_selected:
-                    pg.draw.rect(self._screen, (255, 0, 0), pg.rect.Rect(x * 105, y * 105, 105, 105), 2)
-                if self._valid_moves and self._piece_selected and (y, x) in self._valid_moves:
-                    pg.draw.rect(self._screen, (0, 0, 255), pg.rect.Rect(x * 105, y * 105, 105, 105), 2)
-                if self._game.get(y, x):
-                    self._screen.blit(self._game.get(y, x)._image, (x * 105, y * 105))
-            count = count + 1
-        pg.draw.line(self._screen, (0, 0, 0), (0, 840), (840, 840))
-        pg.draw.line(self._screen, (0, 0, 0), (840, 840), (840, 0))
+                piece = self._game.get(y, x)
+                shown = (piece.surface if piece else None, (y, x) == selected, (y, x) in valid_moves)
+                if shown == self._drawn[y * 8 + x]:
+                    continue
+                self._drawn[y * 8 + x] = shown
+                rect = pg.rect.Rect(x * 105, y * 105, 105, 105)
+                self._screen.blit(self._board_surface, rect, rect)
+                if shown[1]:
+                    pg.draw.rect(self._screen, (255, 0, 0), rect, 2)
+                if shown[2]:
+                    pg.draw.rect(self._screen, (0, 0, 255), rect, 2)
+                if piece:
+                    self._screen.blit(shown[0], rect)
+                dirty.append(rect)
+        return dirty
 
 def main():
-    g = GUI()
+    parser = argparse.ArgumentParser(description="Play chess against the computer.")
+    parser.add_argument("--book", help="an opening book file the computer answers known openings from")
+    parser.add_argument("--tablebases", metavar="DIR",
+                        help="a directory of endgame tables, written beforehand by tablebase.py generate")
+    parser.add_argument("--workers", type=int,
+                        help="search the computer's moves in this many worker processes instead of in the window's")
+    args = parser.parse_args()
+    g = GUI(book=args.book, tablebases=args.tablebases, workers=args.workers)
     g.run_game()
 
 
@@ -0,0 +1,263 @@
+from piece_model import Color, Game, Pawn, PIECE_CLASSES, UNMOVED
+from bitboard import Bitboards
+
+# the kind, an index into PIECE_CLASSES, and the color of every piece code
+CODE_PIECES: dict = {}
+for _code in range(1, 13):
+    CODE_PIECES[_code] = ((_code - 1) % 6, Color((_code - 1) // 6))
+    if PIECE_CLASSES[(_code - 1) % 6] is Pawn:
+        CODE_PIECES[_code | UNMOVED] = CODE_PIECES[_code]
+
+
+class PieceView:
+    """
+    The piece on one square of a CompactBoard, as get and board hand it out. It has the read side of a Piece:
+    its color, its class, first_move and valid_moves, which are worked out on the board it came from. It holds
+    no more than the board and the square, so it is made when asked for and the board keeps only its bytes.
+
+    Attributes:
+        _position (CompactBoard): the board the piece stands on
+        _y (int): the y position of the piece
+        _x (int): the x position of the piece
+    """
+    __slots__ = ("_position", "_y", "_x")
+
+    def __init__(self, position: 'CompactBoard', y: int, x: int) -> None:
+        """
+        Constructor for the view of an occupied square
+
+        Parameters:
+            position (CompactBoard): the board the piece stands on
+            y (int): the y position of the piece
+            x (int): the x position of the piece
+        """
+        self._position = position
+        self._y = y
+        self._x = x
+
+    @property
+    def color(self) -> Color:
+        """
+        getter for the color of the piece
+
+        Returns:
+            Color: the piece's color
+        """
+        return CODE_PIECES[self._position.code(self._y, self._x)][1]
+
+    @property
+    def kind(self) -> int:
+        """
+        getter for the kind of the piece
+
+        Returns:
+            int: the piece's index in PIECE_CLASSES
+        """
+        return CODE_PIECES[self._position.code(self._y, self._x)][0]
+
+    @property
+    def piece_class(self) -> type:
+        """
+        getter for the class a Game would make the piece with, for the isinstance tests a Piece allows
+
+        Returns:
+            type: the piece's class from PIECE_CLASSES
+        """
+        return PIECE_CLASSES[self.kind]
+
+    @property
+    def first_move(self) -> bool:
+        """
+        getter for if the piece is a pawn that still has its first move
+
+        Returns:
+            bool: true for a pawn that has not moved
+        """
+        return bool(self._position.code(self._y, self._x) & UNMOVED)
+
+    def valid_moves(self, y: int, x: int) -> list[tuple[int, int]]:
+        """
+        will list where the piece can move on its board, like Piece.valid_moves
+
+        Parameters:
+            y (int): the y position of the piece
+            x (int): the x position of the piece
+
+        Returns:
+            moves (list[tuple[int,int]]): the (y, x) squares the piece can move to
+        """
+        return self._position.valid_moves(y, x)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PieceView):
+            return NotImplemented
+        return self._position is other._position and (self._y, self._x) == (other._y, other._x)
+
+    def __hash__(self) -> int:
+        return hash((id(self._position), self._y, self._x))
+
+    def __repr__(self) -> str:
+        return f"PieceView({self.color.name} {self.piece_class.__name__} at {(self._y, self._x)})"
+
+
+class CompactBoard:
+    """
+    A position stored as one byte per square, the same piece codes Game.pack writes, and the player to move.
+    There are no piece objects in it: get and board hand out a PieceView for each piece, which reads the square
+    it stands on, and the moves come from the bit set tables in bitboard.
+
+    bytes(board) is the 65 byte form, a bytes object of about a hundred bytes that can be kept by the million
+    and turned back into a board with from_bytes or into a playable Game with to_game.
+
+    Attributes:
+        _squares (bytearray): the piece code of each square in y * 8 + x order, 0 for an empty square
+        _player (Color): the player to move
+    """
+    __slots__ = ("_squares", "_player")
+
+    def __init__(self, squares: bytes = bytes(64), player: Color = Color.WHITE) -> None:
+        """
+        Constructor for a board from piece codes
+
+        Parameters:
+            squares (bytes): the code of each of the 64 squares, an empty board when not given
+            player (Color): the player to move
+
+        Raises:
+            ValueError: when there are not 64 squares or a code is not a piece
+        """
+        if len(squares) != 64:
+            raise ValueError("A compact board must have 64 squares.")
+        for code in squares:
+            if code and code not in CODE_PIECES:
+                raise ValueError(f"Unknown piece code {code} on a compact board.")
+        self._squares = bytearray(squares)
+        self._player = player
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompactBoard':
+        """
+        will read the 65 byte form written by bytes(board) or Game.pack
+
+        Parameters:
+            data (bytes): the squares followed by the color value of the player to move
+
+        Raises:
+            ValueError: when the data is not 65 bytes or holds an unknown piece
+
+        Returns:
+            CompactBoard: the position
+        """
+        if len(data) != 65:
+            raise ValueError("A packed position must be 65 bytes long.")
+        return cls(data[:64], Color(data[64]))
+
+    @classmethod
+    def from_game(cls, game: Game) -> 'CompactBoard':
+        """
+        will copy the current position of a game
+
+        Parameters:
+            game (Game): the game to copy
+
+        Returns:
+            CompactBoard: the position
+        """
+        return cls.from_bytes(game.pack())
+
+    def to_game(self, backend: str = "pieces") -> Game:
+        """
+        will make a game in this position with its own pieces, so it can be played on
+
+        Parameters:
+            backend (str): the move generator the game runs on
+
+        Returns:
+            game (Game): a game in the position, with nothing to undo
+        """
+        return Game.unpack(bytes(self), backend)
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._squares) + bytes((self._player.value,))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactBoard):
+            return NotImplemented
+        return self._squares == other._squares and self._player == other._player
+
+    def __hash__(self) -> int:
+        return hash(bytes(self))
+
+    @property
+    def current_player(self) -> Color:
+        """
+        getter for _player
+
+        Returns:
+            _player (Color): the player to move
+        """
+        return self._player
+
+    @property
+    def board(self) -> list[list]:
+        """
+        getter for the board laid out as Game's, indexed as board[x][y]. It is a new list each time, changing it
+        does not change the position.
+
+        Returns:
+            list[list]: the PieceView of each piece, None for an empty square
+        """
+        return [[self.get(y, x) for y in range(8)] for x in range(8)]
+
+    def get(self, y: int, x: int) -> PieceView:
+        """
+        will return the piece standing on a square, like Game.get
+
+        Parameters:
+            y (int): the y position of the piece
+            x (int): the x position of the piece
+
+        Returns:
+            PieceView: the piece, None for an empty square or a position off the board
+        """
+        if 0 <= x <= 7 and 0 <= y <= 7 and self._squares[y * 8 + x]:
+            return PieceView(self, y, x)
+        return None
+
+    def code(self, y: int, x: int) -> int:
+        """
+        will return the piece code of a square
+
+        Parameters:
+            y (int): the y position of the square
+            x (int): the x position of the square
+
+        Returns:
+            int: the code, 0 for an empty square
+        """
+        return self._squares[y * 8 + x]
+
+    def valid_moves(self, y: int, x: int) -> list[tuple[int, int]]:
+        """
+        will list where the piece on a square can move, whether or not the move leaves its king in check
+
+        Parameters:
+            y (int): the y position of the piece
+            x (int): the x position of the piece
+
+        Returns:
+            moves (list[tuple[int,int]]): the (y, x) squares the piece can move to
+        """
+        return Bitboards.from_squares(self._squares).valid_moves(y, x)
+
+    def legal_moves(self, color: Color = None) -> tuple:
+        """
+        will list every move of a color that does not leave its king in check
+
+        Parameters:
+            color (Color): the color to move, the player to move when not given
+
+        Returns:
+            tuple[tuple[tuple[int,int],tuple[int,int]]]: the ((y, x), (y2, x2)) moves
+        """
+        return tuple(Bitboards.from_squares(self._squares).legal_moves(color or self._player))
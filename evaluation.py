@@ -0,0 +1,184 @@
+from bitboard import KING_ATTACKS, squares
+from piece_model import Color, Game, PIECE_KINDS, UNMOVED
+
+# centipawn value of each kind of piece, the king is never captured so it has none
+MATERIAL = (100, 320, 330, 500, 900, 0)
+# what each square is worth to a piece of each kind, from white's side with the eighth rank first, so a white
+# piece on (y, x) reads entry y * 8 + x and a black piece reads the entry mirrored across the board
+PIECE_SQUARE_TABLES = (
+    # pawn
+    (0, 0, 0, 0, 0, 0, 0, 0,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0),
+    # knight
+    (-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50),
+    # bishop
+    (-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20),
+    # rook
+    (0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     0, 0, 0, 5, 5, 0, 0, 0),
+    # queen
+    (-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20),
+    # king, it is kept behind its pawns
+    (-30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     20, 30, 10, 0, 0, 10, 30, 20),
+)
+# centipawns for every square a side attacks or defends
+MOBILITY = 2
+# centipawns lost for every enemy attack on a square next to the king
+KING_ATTACK = 10
+
+# material and square value of each color value, kind and square, positive when it is good for white
+SQUARE_SCORES: list[list[list[int]]] = [
+    [[MATERIAL[kind] + PIECE_SQUARE_TABLES[kind][sq] for sq in range(64)] for kind in range(6)],
+    [[-MATERIAL[kind] - PIECE_SQUARE_TABLES[kind][sq ^ 56] for sq in range(64)] for kind in range(6)],
+]
+# the same scores by the piece codes of a packed position, every square of code 0 scores 0
+CODE_SCORES: list[list[int]] = [[0] * 64 for _ in range(256)]
+for _code in range(1, 13):
+    CODE_SCORES[_code] = CODE_SCORES[_code | UNMOVED] = SQUARE_SCORES[(_code - 1) // 6][(_code - 1) % 6]
+_numpy_scores = None
+
+
+def piece_score(piece, y: int, x: int) -> int:
+    """
+    will return what a piece standing on a square adds to the score
+
+    Parameters:
+        piece (Piece): the piece, None for an empty square
+        y (int): the y position of the piece
+        x (int): the x position of the piece
+
+    Returns:
+        int: its material and square value, positive for white pieces and negative for black ones
+    """
+    if not piece:
+        return 0
+    return SQUARE_SCORES[piece.color.value][PIECE_KINDS[type(piece)]][y * 8 + x]
+
+
+def board_score(board: list[list]) -> int:
+    """
+    will add up the material and square values of a whole board, Game keeps this total up to date as it moves
+
+    Parameters:
+        board (list[list]): the board indexed as board[x][y] like Game's
+
+    Returns:
+        int: the total, positive when white is ahead
+    """
+    return sum(piece_score(piece, y, x) for x, col in enumerate(board) for y, piece in enumerate(col))
+
+
+def static_score(game: Game) -> int:
+    """
+    will score a position from white's side: the material and square values Game keeps, the number of squares
+    each side attacks, and the enemy attacks on the squares around each king. Every term is read from what move
+    and undo keep up to date, so nothing is scanned.
+
+    Parameters:
+        game (Game): the game to score
+
+    Returns:
+        int: the score in centipawns, positive when white is ahead
+    """
+    attack_map = game.attack_map
+    score = game.score + MOBILITY * (attack_map.total(Color.WHITE.value) - attack_map.total(Color.BLACK.value))
+    for color in Color:
+        king = game.find_king(color)
+        if king is None:
+            continue
+        enemy = 1 - color.value
+        pressure = sum(attack_map.count(sq, enemy) for sq in squares(KING_ATTACKS[king[0] * 8 + king[1]]))
+        score += -KING_ATTACK * pressure if color == Color.WHITE else KING_ATTACK * pressure
+    return score
+
+
+def evaluate(game: Game) -> int:
+    """
+    will score the position for the side that is to move
+
+    Parameters:
+        game (Game): the game to score
+
+    Returns:
+        int: the score in centipawns, positive when the side to move is ahead
+    """
+    score = static_score(game)
+    return score if game.current_player == Color.WHITE else -score
+
+
+def evaluate_packed(data: bytes) -> int:
+    """
+    will add up the material and square values of a packed position, the part of static_score that needs no
+    attack map
+
+    Parameters:
+        data (bytes): the position as Game.pack writes it
+
+    Returns:
+        int: the total from white's side
+    """
+    return sum(CODE_SCORES[data[sq]][sq] for sq in range(64))
+
+
+def evaluate_batch(positions: list) -> list[int]:
+    """
+    will score many packed positions at once like evaluate_packed. With NumPy installed the positions are stacked
+    into one array and scored with a single table lookup, without it they are scored one at a time.
+
+    Parameters:
+        positions (list[bytes]): positions as Game.pack writes them
+
+    Returns:
+        list[int]: the score of each position from white's side
+    """
+    global _numpy_scores
+    try:
+        import numpy as np
+    except ImportError:
+        return [evaluate_packed(data) for data in positions]
+    if not positions:
+        return []
+    if _numpy_scores is None:
+        _numpy_scores = np.array(CODE_SCORES, dtype=np.int32)
+    codes = np.frombuffer(b"".join(bytes(data[:64]) for data in positions), dtype=np.uint8).reshape(-1, 64)
+    return _numpy_scores[codes, np.arange(64)].sum(axis=1).tolist()
@@ -0,0 +1,78 @@
+from typing import Iterable, Iterator
+from piece_model import Game, fen_to_packed
+from compact_board import CompactBoard
+
+
+def fen_text(line: str) -> str:
+    """
+    will cut the FEN out of a line of a FEN file, leaving out anything after a ;
+
+    Parameters:
+        line (str): the line
+
+    Returns:
+        str: the FEN, empty for a blank line or a line starting with #
+    """
+    fen = line.split(";", 1)[0].strip()
+    return "" if fen.startswith("#") else fen
+
+
+def read_fens(lines: Iterable[str]) -> Iterator[tuple[int, bytes]]:
+    """
+    will parse FEN lines one at a time, blank lines and lines starting with # are skipped. Anything after a ; on a
+    line is left out too, so EPD style files with operations can be read.
+
+    Parameters:
+        lines (Iterable[str]): the lines, such as an open file
+
+    Raises:
+        ValueError: when a line is not a position this game can play, the message gives the line number
+
+    Returns:
+        Iterator[tuple[int,bytes]]: the line number and packed position of each FEN, as Game.pack writes it
+    """
+    for number, line in enumerate(lines, 1):
+        fen = fen_text(line)
+        if not fen:
+            continue
+        try:
+            yield number, fen_to_packed(fen)
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from None
+
+
+def load_fens(path: str, backend: str = "pieces") -> Iterator[Game]:
+    """
+    will stream the positions of a file of FEN lines as games. The file is read a line at a time, so it can hold
+    more positions than fit in memory as games.
+
+    Parameters:
+        path (str): the file to read
+        backend (str): the move generator the games run on
+
+    Raises:
+        ValueError: when a line is not a position this game can play
+
+    Returns:
+        Iterator[Game]: a new game for each position
+    """
+    with open(path) as file:
+        for _, packed in read_fens(file):
+            yield Game.unpack(packed, backend)
+
+
+def load_compact(path: str) -> list[CompactBoard]:
+    """
+    will read every position of a file of FEN lines into compact boards, which take about a hundred bytes each
+
+    Parameters:
+        path (str): the file to read
+
+    Raises:
+        ValueError: when a line is not a position this game can play
+
+    Returns:
+        list[CompactBoard]: the positions in file order
+    """
+    with open(path) as file:
+        return [CompactBoard.from_bytes(packed) for _, packed in read_fens(file)]
@@ -0,0 +1,255 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+from typing import Iterable
+from piece_model import Game
+from pgn import read_pgn, parse_san, square_name
+
+# the file starts with a magic word, a format version and the number of entries
+HEADER = struct.Struct("<4sHHI")
+MAGIC = b"LKBK"
+VERSION = 1
+# one entry per position and move, sorted by key and then move: the position's Zobrist key, the from and to
+# squares as y * 8 + x and how often the move was played
+ENTRY = struct.Struct("<QBBH")
+MAX_WEIGHT = 0xFFFF
+
+
+def collect(games: Iterable, max_plies: int = 20, backend: str = "pieces") -> tuple[dict, int]:
+    """
+    will count the moves played in the first plies of some games, by the key of the position they were played in
+
+    Parameters:
+        games (Iterable[PgnGame]): the games, such as read_pgn gives them
+        max_plies (int): how many moves of each game go into the book
+        backend (str): the move generator the games are replayed on
+
+    Returns:
+        tuple[dict[tuple[int,int,int],int],int]: how often each (key, from square, to square) was played, games
+        with a move that is not legal only count up to that move, and the number of games skipped for a FEN tag
+        that is not a position
+    """
+    counts: dict = {}
+    skipped = 0
+    for record in games:
+        fen = record.headers.get("FEN")
+        try:
+            game = Game.from_fen(fen, backend) if fen else Game(backend)
+        except ValueError:
+            skipped += 1
+            continue
+        for text in record.moves[:max_plies]:
+            try:
+                (y, x), (y2, x2) = parse_san(game, text)
+            except ValueError:
+                break
+            entry = (game.position_hash, y * 8 + x, y2 * 8 + x2)
+            counts[entry] = counts.get(entry, 0) + 1
+            game.move(game.get(y, x), y, x, y2, x2)
+    return counts, skipped
+
+
+def write_book(path: str, counts: dict, min_count: int = 1) -> int:
+    """
+    will write counted moves as a book file, sorted so a position's moves can be found by binary search
+
+    Parameters:
+        path (str): the file to write
+        counts (dict[tuple[int,int,int],int]): the moves as collect counts them
+        min_count (int): the times a move must have been played to be kept
+
+    Returns:
+        int: the number of entries written
+    """
+    entries = sorted((key, frm, to, min(count, MAX_WEIGHT)) for (key, frm, to), count in counts.items()
+                     if count >= min_count)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(entries)))
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+def build_book(pgn_path: str, book_path: str, max_plies: int = 20, min_count: int = 1,
+               backend: str = "pieces") -> tuple[int, int]:
+    """
+    will build a book file from the openings of a PGN file, the games are streamed so only the counts are kept
+    in memory
+
+    Parameters:
+        pgn_path (str): the games to learn from
+        book_path (str): the book file to write
+        max_plies (int): how many moves of each game go into the book
+        min_count (int): the times a move must have been played to be kept
+        backend (str): the move generator the games are replayed on
+
+    Returns:
+        tuple[int,int]: the number of entries written and the number of games skipped for a bad FEN tag
+    """
+    with open(pgn_path) as file:
+        counts, skipped = collect(read_pgn(file), max_plies, backend)
+    return write_book(book_path, counts, min_count), skipped
+
+
+class OpeningBook:
+    """
+    A book file opened for lookups. The file is memory mapped read only and searched in place, so opening a book
+    reads nothing but its header, and every process that opens the same file shares the operating system's one
+    copy of its pages. A pickled book only carries its path and maps the file again when it is unpickled, so a
+    searcher with a book can be sent to worker processes.
+
+    Attributes:
+        path (str): the book file
+        _file: the open file, None once closed
+        _map (mmap.mmap): the mapped file, None when the book is empty or closed
+        _count (int): the number of entries
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Constructor that opens and maps a book file
+
+        Parameters:
+            path (str): the book file
+
+        Raises:
+            ValueError: when the file is not a book or has another format version
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = None
+        try:
+            magic, version, _, count = HEADER.unpack(self._file.read(HEADER.size))
+        except struct.error:
+            magic, version, count = b"", 0, 0
+        # a file cut short or written by another version is refused rather than searched
+        if magic != MAGIC or version != VERSION or \
+                os.fstat(self._file.fileno()).st_size != HEADER.size + count * ENTRY.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book.")
+        self._count = count
+        # an empty file can not be mapped, and an empty book needs no map
+        if count:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: the number of entries, one per position and move
+        """
+        return self._count
+
+    def _key_at(self, index: int) -> int:
+        # the key of an entry read straight from the map
+        return struct.unpack_from("<Q", self._map, HEADER.size + index * ENTRY.size)[0]
+
+    def entries(self, key: int) -> list[tuple[tuple[tuple[int, int], tuple[int, int]], int]]:
+        """
+        will find the moves of a position by binary search on the mapped file
+
+        Parameters:
+            key (int): the position's Zobrist key
+
+        Returns:
+            list[tuple[tuple[tuple[int,int],tuple[int,int]],int]]: each (((y, x), (y2, x2)), weight) of the
+            position, empty when it is not in the book
+        """
+        if self._map is None:
+            return []
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        offset = HEADER.size + low * ENTRY.size
+        while low < self._count:
+            entry_key, frm, to, weight = ENTRY.unpack_from(self._map, offset)
+            if entry_key != key:
+                break
+            found.append(((divmod(frm, 8), divmod(to, 8)), weight))
+            low += 1
+            offset += ENTRY.size
+        return found
+
+    def probe(self, game: Game, rng: random.Random = None) -> tuple:
+        """
+        will pick a book move for the player to move. Moves that are not legal in the game are skipped, so a key
+        that two positions share can not make the computer play a wrong move.
+
+        Parameters:
+            game (Game): the game to find a move for
+            rng (random.Random): picks among the moves by weight when given, otherwise the most played move is
+                taken and ties go to the first in the file
+
+        Returns:
+            tuple[tuple[int,int],tuple[int,int]]: the ((y, x), (y2, x2)) move, None when the position is not in
+            the book
+        """
+        found = self.entries(game.position_hash)
+        if not found:
+            return None
+        legal = set(game.legal_moves())
+        found = [(move, weight) for move, weight in found if move in legal]
+        if not found:
+            return None
+        if rng is None:
+            return max(found, key=lambda entry: entry[1])[0]
+        return rng.choices([move for move, _ in found], [weight for _, weight in found])[0]
+
+    def close(self) -> None:
+        """
+        will unmap and close the file, the book answers nothing afterwards
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._count = 0
+
+    def __enter__(self) -> 'OpeningBook':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict:
+        # a map can not be pickled, the other process maps the file itself
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or look into an opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from the openings of a PGN file")
+    build.add_argument("pgn", help="the games to learn from")
+    build.add_argument("book", help="the book file to write")
+    build.add_argument("--plies", type=int, default=20, help="how many moves of each game go into the book")
+    build.add_argument("--min-count", type=int, default=1, help="times a move must be played to be kept")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book", help="the book file to read")
+    probe.add_argument("fen", nargs="?", help="the position, the start position when not given")
+    args = parser.parse_args()
+    if args.command == "build":
+        count, skipped = build_book(args.pgn, args.book, args.plies, args.min_count)
+        print(f"{count} entries written to {args.book}")
+        if skipped:
+            print(f"{skipped} games skipped for a FEN tag that is not a position")
+        return
+    game = Game.from_fen(args.fen) if args.fen else Game()
+    with OpeningBook(args.book) as book:
+        for (frm, to), weight in sorted(book.entries(game.position_hash), key=lambda entry: -entry[1]):
+            print(f"{square_name(*frm)}{square_name(*to)} {weight}")
+
+
+if __name__ == '__main__':
+    main()
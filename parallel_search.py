@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from piece_model import Game
+from search import Searcher, SearchResult, evaluate, PIECE_VALUES, MATE, MAX_PLY, INFINITY
+from transposition import TranspositionTable
+
+# how often the search checks for a stop or the deadline while it waits on the workers, in seconds
+POLL_INTERVAL = 0.02
+
+# the searcher a worker process keeps between tasks, so its table is only allocated once, and what the pool
+# shares with its workers: the cancel event and the best score of the iteration so far
+_worker_state: dict = {}
+
+
+def _init_worker(cancel, best) -> None:
+    # runs once in each worker process as it starts
+    _worker_state["cancel"] = cancel
+    _worker_state["best"] = best
+
+
+def _score_root_moves(packed: bytes, backend: str, moves: list, depth: int, deadline: float) -> tuple:
+    """
+    will score some root moves of a packed position, this runs in a worker process. Each move is searched with the
+    best score the workers have found in this iteration so far, less one, as its alpha bound, and a move that
+    beats it raises the shared score for the moves searched after it.
+
+    Parameters:
+        packed (bytes): the position as written by Game.pack
+        backend (str): the move generator to search with
+        moves (list): the ((y, x), (y2, x2)) moves to score
+        depth (int): how many plies to search each move, including the move
+        deadline (float): the time.time() all of the moves must be scored by, None for no limit
+
+    Returns:
+        tuple[list,int]: the score of each move, None for the moves the time ran out on or that were cancelled,
+        and the nodes visited
+    """
+    if "searcher" not in _worker_state:
+        _worker_state["searcher"] = Searcher(time_limit=None, table=TranspositionTable(megabytes=4))
+        _worker_state["searcher"].cancel = _worker_state.get("cancel")
+    searcher = _worker_state["searcher"]
+    best = _worker_state.get("best")
+    scores = []
+    nodes = 0
+    for move in moves:
+        remaining = None if deadline is None else deadline - time.time()
+        if (remaining is not None and remaining <= 0) or (searcher.cancel is not None and searcher.cancel.is_set()):
+            scores.append(None)
+            continue
+        searcher.time_limit = remaining
+        # one below the best so far, so a move that ties the best is still scored exactly and the merge is the
+        # same whichever worker got there first
+        alpha = -INFINITY if best is None else max(-INFINITY, best.value - 1)
+        # every move starts from a fresh game, undo changes the order pieces are generated in
+        score = searcher.score_move(Game.unpack(packed, backend), move, depth, alpha)
+        nodes += searcher.nodes
+        if score is not None and best is not None:
+            with best.get_lock():
+                if score > best.value:
+                    best.value = score
+        scores.append(score)
+    return scores, nodes
+
+
+class ParallelSearcher:
+    """
+    Iterative deepening search that scores the root moves in a pool of worker processes. The position is sent to
+    the workers as the 65 bytes of Game.pack and every root move is searched on its own. The workers share the
+    best score of the iteration so far, which later root moves are searched against as their alpha bound, and
+    each iteration tries the moves in the order of the scores of the one before.
+
+    The scores are merged in a fixed order: the best score wins and a tie goes to the move that comes first in the
+    position's own ordering. The alpha bound is one below the best so far, so every move with the best score is
+    scored exactly, and the chosen move is the same whatever the number of workers and whichever worker finishes
+    first. An iteration that runs out of time or is stopped is thrown away and the move of the last finished one
+    is returned.
+
+    A stop or the deadline sets an event the workers check as they search, so the moves they are on end within a
+    few hundred nodes and the moves they have not started are cancelled.
+
+    It has the same search method as Searcher, so it can be set as a game's engine. Like Searcher it answers from
+    its opening book and endgame tables at the root without searching.
+
+    Attributes:
+        workers (int): the number of worker processes
+        max_depth (int): the deepest iteration to search
+        time_limit (float): the wall clock budget in seconds, None for no limit
+        book (OpeningBook): the book played from before searching, None for no book
+        tablebases (Tablebases): the solved endings played from before searching, None for none
+    """
+
+    def __init__(self, workers: int = None, max_depth: int = 4, time_limit: float = None, book=None,
+                 tablebases=None) -> None:
+        """
+        Constructor for a parallel searcher, the worker processes are only started by the first search
+
+        Parameters:
+            workers (int): the number of worker processes, one per core when not given
+            max_depth (int): the deepest iteration to search
+            time_limit (float): the wall clock budget in seconds, None for no limit
+            book (OpeningBook): the book to play from, None for no book
+            tablebases (Tablebases): the solved endings to play from, None for none
+
+        Raises:
+            ValueError: when workers or max_depth is less than 1
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("There must be at least one worker.")
+        if max_depth < 1:
+            raise ValueError("The search depth must be at least 1.")
+        self.workers = workers
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.book = book
+        self.tablebases = tablebases
+        self._pool = None
+        self._cancel = None
+        self._best = None
+        self._stopped = False
+
+    def __enter__(self) -> 'ParallelSearcher':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def stop(self) -> None:
+        """
+        asks a search running in another thread to finish early. The workers stop the moves they are on, the
+        moves they have not started are cancelled and the move of the last finished iteration is returned. The
+        stop holds until a search returns, so one that comes just before the search starts still ends it.
+        """
+        self._stopped = True
+        if self._cancel is not None:
+            self._cancel.set()
+
+    def clear_stop(self) -> None:
+        """
+        forgets a stop that no search has returned for, such as one that came after the search had finished
+        """
+        self._stopped = False
+        if self._cancel is not None:
+            self._cancel.clear()
+
+    def close(self) -> None:
+        """
+        stops the worker processes, a later search starts new ones
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def search(self, game: Game) -> SearchResult:
+        """
+        will search the position for the side to move, the game itself is not changed
+
+        Parameters:
+            game (Game): the game to search
+
+        Returns:
+            SearchResult: the best move found and how the search went
+        """
+        try:
+            return self._search(game)
+        finally:
+            # the stop is used up by the search it ended
+            self.clear_stop()
+
+    def _search(self, game: Game) -> SearchResult:
+        # the search itself, search clears the stop however this returns
+        start = time.perf_counter()
+        # the workers are in other processes, so the deadline is on the clock every process shares
+        deadline = None if self.time_limit is None else time.time() + self.time_limit
+        color = game.current_player
+        root_moves = self._order(game, list(game.legal_moves(color)))
+        if not root_moves:
+            return SearchResult(None, -MATE if game.check(color) else 0, 0, 0, time.perf_counter() - start)
+        # a book move or a solved ending is played without starting the workers, as Searcher does
+        if self.book is not None:
+            move = self.book.probe(game)
+            if move is not None:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start)
+        if self.tablebases is not None:
+            found = self.tablebases.best_move(game)
+            if found is not None:
+                return SearchResult(found[0], found[1], 0, 0, time.perf_counter() - start)
+        if len(root_moves) == 1:
+            return SearchResult(root_moves[0], evaluate(game), 0, 0, time.perf_counter() - start)
+        if self._pool is None:
+            self._cancel = multiprocessing.Event()
+            self._best = multiprocessing.Value("i", -INFINITY)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self._cancel, self._best))
+        packed = game.pack()
+        # the place of each move in the position's own ordering breaks ties, whatever order it was searched in
+        rank = {move: i for i, move in enumerate(root_moves)}
+        best_move, best_score, finished, nodes = root_moves[0], 0, 0, 0
+        for depth in range(1, self.max_depth + 1):
+            if self._stopped or (deadline is not None and time.time() >= deadline):
+                break
+            self._best.value = -INFINITY
+            # round robin keeps the expensive and cheap moves of the ordering spread over the workers
+            chunks = [list(range(i, len(root_moves), self.workers)) for i in range(min(self.workers, len(root_moves)))]
+            futures = [self._pool.submit(_score_root_moves, packed, game.backend, [root_moves[i] for i in chunk],
+                                         depth, deadline) for chunk in chunks]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=POLL_INTERVAL)
+                if pending and (self._stopped or (deadline is not None and time.time() >= deadline)):
+                    self._cancel.set()
+                    for future in pending:
+                        future.cancel()
+                    # the running ones see the event within a few hundred nodes
+                    wait(pending)
+                    break
+            scores = [None] * len(root_moves)
+            for chunk, future in zip(chunks, futures):
+                if future.cancelled():
+                    continue
+                chunk_scores, chunk_nodes = future.result()
+                nodes += chunk_nodes
+                for i, score in zip(chunk, chunk_scores):
+                    scores[i] = score
+            if None in scores:
+                break
+            # the first of the best scores in the position's ordering, so the merge does not depend on the workers
+            index = max(range(len(root_moves)), key=lambda i: (scores[i], -rank[root_moves[i]]))
+            best_move, best_score, finished = root_moves[index], scores[index], depth
+            if abs(best_score) >= MATE - MAX_PLY:
+                break
+            # the next iteration searches the best moves first, so the shared bound is high early on
+            order = sorted(range(len(root_moves)), key=lambda i: (-scores[i], rank[root_moves[i]]))
+            root_moves = [root_moves[i] for i in order]
+        return SearchResult(best_move, best_score, finished, nodes, time.perf_counter() - start)
+
+    @staticmethod
+    def _order(game: Game, moves: list) -> list:
+        # captures of the most valuable pieces first and then by square, only the position decides the order
+        def key(move: tuple) -> tuple:
+            victim = game.get(*move[1])
+            return -PIECE_VALUES[type(victim)] if victim else 0, move
+
+        return sorted(moves, key=key)
@@ -0,0 +1,169 @@
+import argparse
+import sys
+import time
+from piece_model import Game
+from fen_loader import load_fens
+
+# test positions as the moves that reach them from the start or as a FEN, each with its node counts by depth.
+# The counts are for this game's rules, which have no castling or en passant and always promote to a queen, so
+# they match the published start position counts up to depth 4 and leave out the 258 en passant captures at
+# depth 5. The endgame is the published perft position 3 without its en passant captures, 2 of them at depth 3.
+POSITIONS = {
+    "initial": ((), {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865351}),
+    # 1.e4 f5 2.Qh5+, black must answer the check
+    "check": (((6, 4, 4, 4), (1, 5, 3, 5), (7, 3, 3, 7)), {1: 1, 2: 39, 3: 794, 4: 29937}),
+    # 1.e4 d5 2.exd5 c6 3.dxc6 Nf6 4.cxb7 Nbd7, the pawn on b7 can promote on a8 or c8
+    "promotion": (((6, 4, 4, 4), (1, 3, 3, 3), (4, 4, 3, 3), (1, 2, 2, 2), (3, 3, 2, 2), (0, 6, 2, 5),
+                   (2, 2, 1, 1), (0, 1, 1, 3)), {1: 32, 2: 728, 3: 24436, 4: 669732}),
+    # 1.e4 e5 2.Bc4 Nc6 3.Qh5 Nf6, white can mate with Qxf7
+    "mate": (((6, 4, 4, 4), (1, 4, 3, 4), (7, 5, 4, 2), (0, 1, 2, 2), (7, 3, 3, 7), (0, 6, 2, 5)),
+             {1: 43, 2: 1133, 3: 45611, 4: 1280683}),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 191, 3: 2810, 4: 43087}),
+}
+
+
+def square_name(y: int, x: int) -> str:
+    """
+    will name a board position the way chess players do, the bottom left square is a1
+
+    Parameters:
+        y (int): the y position on the board
+        x (int): the x position on the board
+
+    Returns:
+        str: the file letter and rank number of the square
+    """
+    return "abcdefgh"[x] + str(8 - y)
+
+
+def perft(game: Game, depth: int) -> int:
+    """
+    will count the positions reached by playing every legal move to a fixed depth. The moves come from the
+    game's valid_moves and are made and taken back with move and undo, so the count tests the rules themselves.
+
+    Parameters:
+        game (Game): the game to count from, it is back in the same position when this returns
+        depth (int): how many plies to play
+
+    Returns:
+        nodes (int): the number of positions at the given depth
+    """
+    if depth == 0:
+        return 1
+    nodes = 0
+    for (y, x), piece in list(game.get_pieces(game.current_player)):
+        for y2, x2 in game.valid_moves(y, x):
+            if game.move(piece, y, x, y2, x2):
+                nodes += perft(game, depth - 1) if depth > 1 else 1
+                game.undo(False)
+    return nodes
+
+
+def divide(game: Game, depth: int) -> dict[str, int]:
+    """
+    will count the positions below each legal move separately, which narrows a wrong count down to a move
+
+    Parameters:
+        game (Game): the game to count from
+        depth (int): how many plies to play, including the first move
+
+    Returns:
+        counts (dict[str,int]): the count for each move, keyed by its from and to squares such as "e2e4"
+    """
+    counts = {}
+    for (y, x), piece in list(game.get_pieces(game.current_player)):
+        for y2, x2 in game.valid_moves(y, x):
+            if game.move(piece, y, x, y2, x2):
+                counts[square_name(y, x) + square_name(y2, x2)] = perft(game, depth - 1)
+                game.undo(False)
+    return counts
+
+
+def load(name: str, backend: str = "pieces") -> Game:
+    """
+    will set a game up in one of the test positions
+
+    Parameters:
+        name (str): the key of the position in POSITIONS
+        backend (str): the move generator the game runs on
+
+    Raises:
+        ValueError: when a move that reaches the position is not legal
+
+    Returns:
+        game (Game): a game in the position
+    """
+    setup = POSITIONS[name][0]
+    if isinstance(setup, str):
+        return Game.from_fen(setup, backend)
+    game = Game(backend)
+    for y, x, y2, x2 in setup:
+        if not game.move(game.get(y, x), y, x, y2, x2):
+            raise ValueError(f"Illegal move {square_name(y, x)}{square_name(y2, x2)} in position {name}.")
+    return game
+
+
+def verify(depth: int, backends: tuple) -> bool:
+    """
+    will run every test position on every backend up to a depth and compare with the known counts
+
+    Parameters:
+        depth (int): the deepest count to test
+        backends (tuple): the names of the backends to test
+
+    Returns:
+        bool: if every count matched
+    """
+    passed = True
+    for name, (_, expected) in POSITIONS.items():
+        for backend in backends:
+            game = load(name, backend)
+            for d in range(1, min(depth, max(expected)) + 1):
+                nodes = perft(game, d)
+                ok = nodes == expected[d]
+                passed = passed and ok
+                print(f"{'PASS' if ok else 'FAIL'}  {name:<10} {backend:<9} depth {d}  {nodes:>10}"
+                      + ("" if ok else f"  expected {expected[d]}"))
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count and time move generation from test positions.")
+    parser.add_argument("--depth", type=int, default=4, help="the deepest depth to count")
+    parser.add_argument("--position", choices=sorted(POSITIONS), action="append",
+                        help="position to count from, can be given more than once, all of them by default")
+    parser.add_argument("--backend", choices=Game.BACKENDS, default="pieces", help="the move generator to use")
+    parser.add_argument("--divide", action="store_true", help="print the count below each move at --depth")
+    parser.add_argument("--verify", action="store_true", help="check the counts of every position and backend")
+    parser.add_argument("--fen-file", help="count every position of a file of FEN lines to --depth instead")
+    args = parser.parse_args()
+    if args.verify:
+        sys.exit(0 if verify(args.depth, Game.BACKENDS) else 1)
+    if args.fen_file:
+        start = time.perf_counter()
+        total = positions = 0
+        for game in load_fens(args.fen_file, args.backend):
+            total += perft(game, args.depth)
+            positions += 1
+        elapsed = time.perf_counter() - start
+        print(f"{positions} positions  {args.backend:<9} depth {args.depth}  nodes {total:>10}  "
+              f"time {elapsed:8.3f} s  {total / elapsed if elapsed else 0:>10.0f} nodes/s")
+        return
+    for name in args.position or POSITIONS:
+        game = load(name, args.backend)
+        if args.divide:
+            counts = divide(game, args.depth)
+            for move in sorted(counts):
+                print(f"{move}: {counts[move]}")
+            print(f"moves: {len(counts)}  nodes: {sum(counts.values())}")
+            continue
+        for d in range(1, args.depth + 1):
+            start = time.perf_counter()
+            nodes = perft(game, d)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {args.backend:<9} depth {d}  nodes {nodes:>10}  "
+                  f"time {elapsed:8.3f} s  {nodes / elapsed if elapsed else 0:>10.0f} nodes/s")
+
+
+if __name__ == '__main__':
+    main()
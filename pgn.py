@@ -0,0 +1,292 @@
+import re
+from typing import Iterable, Iterator, NamedTuple
+from piece_model import Color, Game, Outcome, Pawn, King, Queen, Bishop, Knight, Rook, packed_to_fen
+
+# the SAN letter of each piece, pawns have none
+PIECE_LETTERS = {Knight: "N", Bishop: "B", Rook: "R", Queen: "Q", King: "K"}
+LETTER_PIECES = {letter: piece_class for piece_class, letter in PIECE_LETTERS.items()}
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# the tags every exported game has, in the order the PGN standard gives them
+SEVEN_TAG_ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+_SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+_TAG = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+_TOKEN = re.compile(r'\{|\}|\(|\)|;|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{}();]+')
+
+
+class PgnGame(NamedTuple):
+    """
+    one game as it was read from a PGN file, the moves are not checked until it is replayed
+
+    Attributes:
+        headers (dict[str,str]): the tag pairs
+        moves (list[str]): the moves of the main line in SAN, without comments or variations
+        result (str): the result the movetext ended with, * when it is unknown
+    """
+    headers: dict
+    moves: list
+    result: str
+
+
+def square_name(y: int, x: int) -> str:
+    """
+    will name a board position the way chess players do, the bottom left square is a1
+
+    Parameters:
+        y (int): the y position on the board
+        x (int): the x position on the board
+
+    Returns:
+        str: the file letter and rank number of the square
+    """
+    return "abcdefgh"[x] + str(8 - y)
+
+
+def san(game: Game, move: tuple) -> str:
+    """
+    will write a legal move of the player to move in Standard Algebraic Notation, such as "Nbd7", "exd5", "e8=Q"
+    or "Qxf7#"
+
+    Parameters:
+        game (Game): the game the move is played in, it is back in the same position when this returns
+        move (tuple[tuple[int,int],tuple[int,int]]): the ((y, x), (y2, x2)) move
+
+    Raises:
+        ValueError: when the move is not legal
+
+    Returns:
+        str: the move in SAN
+    """
+    legal = game.legal_moves()
+    if move not in legal:
+        raise ValueError(f"The move {move} is not legal.")
+    (y, x), (y2, x2) = move
+    piece = game.get(y, x)
+    capture = game.get(y2, x2) is not None
+    if isinstance(piece, Pawn):
+        text = ("abcdefgh"[x] + "x" if capture else "") + square_name(y2, x2)
+        if y2 in (0, 7):
+            text += "=Q"
+    else:
+        # another piece of the same kind that can reach the square has to be told apart by file, rank or both
+        others = [frm for frm, to in legal if to == (y2, x2) and frm != (y, x) and type(game.get(*frm)) is type(piece)]
+        hint = ""
+        if others:
+            if all(ox != x for _, ox in others):
+                hint = "abcdefgh"[x]
+            elif all(oy != y for oy, _ in others):
+                hint = str(8 - y)
+            else:
+                hint = square_name(y, x)
+        text = PIECE_LETTERS[type(piece)] + hint + ("x" if capture else "") + square_name(y2, x2)
+    color = game.current_player
+    game.move(piece, y, x, y2, x2)
+    try:
+        opponent = Color.BLACK if color == Color.WHITE else Color.WHITE
+        if game.check(opponent):
+            text += "+" if game.has_legal_move(opponent) else "#"
+    finally:
+        game.undo(False)
+    return text
+
+
+def parse_san(game: Game, text: str) -> tuple:
+    """
+    will find the legal move of the player to move that a SAN move stands for. Check marks and annotations such
+    as "!?" are ignored, and a move that names its piece's square more fully than it needs to is accepted.
+
+    Parameters:
+        game (Game): the game the move is played in
+        text (str): the move in SAN
+
+    Raises:
+        ValueError: when the text is not SAN, castles or promotes to anything but a queen, which this game's rules
+        do not have, or does not match exactly one legal move
+
+    Returns:
+        tuple[tuple[int,int],tuple[int,int]]: the ((y, x), (y2, x2)) move
+    """
+    clean = text.rstrip("+#!?")
+    if clean.replace("0", "O") in ("O-O", "O-O-O"):
+        raise ValueError(f"Castling is not part of this game's rules: {text!r}")
+    match = _SAN.match(clean)
+    if not match:
+        raise ValueError(f"Not a SAN move: {text!r}")
+    letter, from_file, from_rank, to, promotion = match.groups()
+    if promotion and promotion != "Q":
+        raise ValueError(f"Pawns only promote to a queen in this game: {text!r}")
+    piece_class = LETTER_PIECES[letter] if letter else Pawn
+    y2, x2 = 8 - int(to[1]), "abcdefgh".index(to[0])
+    found = [(frm, dest) for frm, dest in game.legal_moves() if dest == (y2, x2)
+             and type(game.get(*frm)) is piece_class
+             and (from_file is None or frm[1] == "abcdefgh".index(from_file))
+             and (from_rank is None or frm[0] == 8 - int(from_rank))]
+    if len(found) != 1:
+        raise ValueError(f"{text!r} matches {len(found)} legal moves.")
+    return found[0]
+
+
+def game_result(game: Game) -> str:
+    """
+    will give the PGN result of the current position
+
+    Parameters:
+        game (Game): the game
+
+    Returns:
+        str: "1-0" or "0-1" when the player to move is mated, "1/2-1/2" when the game is drawn, * otherwise
+    """
+    outcome = game.outcome()
+    if outcome == Outcome.ONGOING:
+        return "*"
+    if outcome == Outcome.CHECKMATE:
+        return "0-1" if game.current_player == Color.WHITE else "1-0"
+    return "1/2-1/2"
+
+
+def write_pgn(game: Game, headers: dict = None) -> str:
+    """
+    will export the moves of a game in PGN. The seven required tags are always written, ? when not given, and a
+    game that was loaded from a position gets SetUp and FEN tags.
+
+    Parameters:
+        game (Game): the game, its move log is replayed from its start position
+        headers (dict[str,str]): tags to write, Result is worked out from the game when not given
+
+    Returns:
+        str: the game in PGN, ending with a blank line
+    """
+    tags = {tag: "?" for tag in SEVEN_TAG_ROSTER}
+    tags["Date"] = "????.??.??"
+    tags["Result"] = game_result(game)
+    tags.update(headers or {})
+    start = game.start_position
+    if start is not None:
+        tags["SetUp"] = "1"
+        tags["FEN"] = packed_to_fen(start)
+    replay_game = Game() if start is None else Game.unpack(start)
+    words = []
+    number = 1
+    for move in game.move_log():
+        if replay_game.current_player == Color.WHITE:
+            words.append(f"{number}.")
+        elif not words:
+            words.append(f"{number}...")
+        words.append(san(replay_game, move))
+        (y, x), (y2, x2) = move
+        replay_game.move(replay_game.get(y, x), y, x, y2, x2)
+        if replay_game.current_player == Color.WHITE:
+            number += 1
+    words.append(tags["Result"])
+    lines = [f'[{tag} "{value}"]' for tag, value in
+             ((name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in tags.items())]
+    lines.append("")
+    line = ""
+    # movetext lines are kept under 80 characters
+    for word in words:
+        if line and len(line) + 1 + len(word) > 79:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def read_pgn(lines: Iterable[str]) -> Iterator[PgnGame]:
+    """
+    will parse games from PGN lines one game at a time, so an archive of any size is read in the memory of its
+    longest game. Comments, variations, numeric annotations and move numbers are skipped.
+
+    Parameters:
+        lines (Iterable[str]): the lines, such as an open file
+
+    Returns:
+        Iterator[PgnGame]: each game in the order it appears
+    """
+    headers: dict = {}
+    moves: list = []
+    in_comment = False
+    depth = 0
+    for line in lines:
+        if in_comment:
+            end = line.find("}")
+            if end < 0:
+                continue
+            in_comment = False
+            line = line[end + 1:]
+        stripped = line.strip()
+        if stripped.startswith("%"):
+            continue
+        tag = _TAG.match(stripped) if depth == 0 else None
+        if tag:
+            # a tag after the movetext starts the next game of a file that left out a result
+            if moves:
+                yield PgnGame(headers, moves, headers.get("Result", "*"))
+                headers, moves = {}, []
+            headers[tag.group(1)] = re.sub(r"\\(.)", r"\1", tag.group(2))
+            continue
+        for token in _TOKEN.finditer(line):
+            token = token.group()
+            if in_comment:
+                in_comment = token != "}"
+            elif token == "{":
+                in_comment = True
+            elif token == ";":
+                break
+            elif token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(depth - 1, 0)
+            elif depth or token[0] == "$" or token[0].isdigit() and token.endswith("."):
+                continue
+            elif token in RESULTS:
+                yield PgnGame(headers, moves, token)
+                headers, moves = {}, []
+            else:
+                moves.append(token)
+    if headers or moves:
+        yield PgnGame(headers, moves, headers.get("Result", "*"))
+
+
+def replay(record: PgnGame, backend: str = "pieces") -> Game:
+    """
+    will play the moves of a PGN game with Game.move, from its FEN tag when it has one
+
+    Parameters:
+        record (PgnGame): the game as it was read
+        backend (str): the move generator the game runs on
+
+    Raises:
+        ValueError: when a move is not legal or not SAN, the message gives the ply
+
+    Returns:
+        game (Game): the game after its last move
+    """
+    fen = record.headers.get("FEN")
+    game = Game.from_fen(fen, backend) if fen else Game(backend)
+    for ply, text in enumerate(record.moves, 1):
+        try:
+            (y, x), (y2, x2) = parse_san(game, text)
+        except ValueError as error:
+            raise ValueError(f"ply {ply}: {error}") from None
+        game.move(game.get(y, x), y, x, y2, x2)
+    return game
+
+
+def replay_games(lines: Iterable[str], backend: str = "pieces") -> Iterator[tuple[PgnGame, Game]]:
+    """
+    will read and replay PGN games one at a time
+
+    Parameters:
+        lines (Iterable[str]): the lines, such as an open file
+        backend (str): the move generator the games run on
+
+    Raises:
+        ValueError: when a game has a move that is not legal
+
+    Returns:
+        Iterator[tuple[PgnGame,Game]]: each game as it was read and after its last move
+    """
+    for record in read_pgn(lines):
+        yield record, replay(record, backend)
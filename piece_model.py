@@ -1,7 +1,9 @@
 from enum import Enum
+from collections import OrderedDict
+from itertools import chain
 import abc
-import pygame as pg
-import random
+from typing import NamedTuple
+from sprite_atlas import SpriteAtlas
 
 
 class Color(Enum):
@@ -13,11 +15,27 @@ class Color(Enum):
     BLACK = 1
 
 
+class Outcome(Enum):
+    """
+    Enumeration class for how the game stands for the player to move, everything but ONGOING ends the game
+    """
+    ONGOING = 0
+    CHECKMATE = 1
+    STALEMATE = 2
+    # the same position with the same player to move for the third time
+    REPETITION = 3
+    # fifty moves by each player without a pawn move or a capture
+    FIFTY_MOVES = 4
+    # neither player has the pieces left to give checkmate
+    INSUFFICIENT_MATERIAL = 5
+
+
 class Piece(abc.ABC):
     """
     Jack Bellgowan, Connor Ostrowski, and Tim Lightner
     Abstract class for a piece of a chess game with the static variables image with is the
     file path for the png images. the static variable game so the pieces can keep track of the current game.
+    The static variable ATLAS is the spritesheet shared by every piece, it is not loaded until something is drawn.
 
     Attributes:
         _board (list[list]): the board for the piece to be played on
@@ -27,7 +45,10 @@ class Piece(abc.ABC):
     image = "./images/pieces.png"
     # _game is used to keep track of the current game
     _game = None
-    SPRITESHEET = pg.image.load("images/pieces.png")
+    # decoded on the first draw, so importing the model needs neither pygame nor the image file
+    ATLAS = SpriteAtlas(image)
+    # pieces have no instance dictionary, a game keeps 32 of them and the search makes more with every promotion
+    __slots__ = ("_board", "_color", "_sprite")
 
     def __init__(self, color: Color, board: list[list]):
         """
@@ -35,7 +56,8 @@ class Piece(abc.ABC):
         """
         self._board = board
         self._color = color
-        self._image = pg.Surface((105, 105), pg.SRCALPHA)
+        # where the piece's sprite sits in the spritesheet, the surface itself lives in Piece.ATLAS
+        self._sprite: tuple[int, int] = (0, 0)
 
     @staticmethod
     def set_game(game):
@@ -62,17 +84,38 @@ class Piece(abc.ABC):
         """
         return self._color
 
+    @property
+    def sprite(self) -> tuple[int, int]:
+        """
+        getter for the sprite attribute
+
+        Returns:
+            _sprite (tuple[int,int]): the x and y of the piece's 105x105 pixel chunk in the images file
+        """
+        return self._sprite
+
+    @property
+    def surface(self):
+        """
+        getter for the piece's sprite, it comes from the shared atlas which loads the spritesheet the first time
+
+        Returns:
+            surface (pg.Surface): the 105x105 image of the piece
+        """
+        return Piece.ATLAS.sprite(self._sprite[0], self._sprite[1])
+
     def set_image(self, x: int, y: int) -> None:
         """
-        will take an x and y from the images file and will copy into a 105x105 pixel chunk into
-        the current pieces image
+        will take an x and y from the images file and remember where the piece's 105x105 pixel chunk is.
+        No surface is made here so pieces stay plain data and can be copied by the game without any drawing
+        work, the chunk is cut out of Piece.ATLAS once per type and color when it is first drawn.
 
         Parameters:
             x (int): the x coordinate for the piece in the file
             y (int): the y coordinate for the piece in the file
         """
-        # take an x and y value and copy from the image file a 105x105 pixel chunk into the current piece's image
-        self._image.blit(Piece.SPRITESHEET, (0, 0), pg.rect.Rect(x, y, 105, 105))
+        # only the location is kept, the gui cuts the 105x105 pixel chunk out when it draws the piece
+        self._sprite = (x, y)
 
     def _diagonal_moves(self, y: int, x: int, y_d: int, x_d: int, distance: int) -> list[tuple[int, int]]:
         # checks for possible diagonal moves with a given vector
@@ -236,6 +279,8 @@ class King(Piece):
         board (list[list]]): the current baord for the game
     """
 
+    __slots__ = ()
+
     def __init__(self, color: Color, board: list[list]) -> None:
         """
         Constructor for the king class and calls the set_image method to get an image for the kind
@@ -288,6 +333,8 @@ class Queen(Piece):
         board (list[list]]): the current board for the game
     """
 
+    __slots__ = ()
+
     def __init__(self, color: Color, board: list[list]) -> None:
         """
         Constructor for the Queen class and calls the set_image method to get an image for the queen
@@ -339,6 +386,8 @@ class Bishop(Piece):
         color (Color): the color of the Bishop piece
         board (list[list]]): the current board for the game
     """
+    __slots__ = ()
+
     def __init__(self, color: Color, board: list[list]) -> None:
         """
         Constructor for the bishop class and calls the set_image method to get an image for the bishop
@@ -388,6 +437,8 @@ class Knight(Piece):
         color (Color): the color of the Knight piece
         board (list[list]]): the current board for the game
     """
+    __slots__ = ()
+
     def __init__(self, color: Color, board: list[list]) -> None:
         """
         Constructor for the Knight class and calls the set_image method to get an image for the Knight
@@ -482,6 +533,8 @@ class Rook(Piece):
         color (Color): the color of the Rook piece
         board (list[list]]): the current board for the game
     """
+    __slots__ = ()
+
     def __init__(self, color: Color, board: list[list]) -> None:
         """
         Constructor for the Rook class and calls the set_image method to get an image for the Rook
@@ -531,6 +584,8 @@ class Pawn(Piece):
         color (Color): the color of the Pawn piece
         board (list[list]]): the current board for the game
     """
+    __slots__ = ("_first_move",)
+
     def __init__(self, color: Color, board: list[list], first_move: bool = True) -> None:
         """
         Constructor for the Pawn class and calls the set_image method to get an image for the Pawn
@@ -622,16 +677,151 @@ class Pawn(Piece):
         return Pawn(Color.BLACK if self.color == Color.BLACK else Color.WHITE, self._board, self._first_move)
 
 
+# every kind of piece, a piece's kind is its index here
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+PIECE_KINDS = {piece_class: kind for kind, piece_class in enumerate(PIECE_CLASSES)}
+# added to a pawn's code while it still has its first move
+UNMOVED = 128
+
+
+def piece_code(piece: Piece) -> int:
+    """
+    will give the byte a piece is stored as in a packed position
+
+    Parameters:
+        piece (Piece): the piece, None for an empty square
+
+    Returns:
+        int: 0 for an empty square, otherwise 1 + the piece's kind + 6 * its color value, with UNMOVED added for a
+        pawn that still has its first move
+    """
+    if not piece:
+        return 0
+    code = 1 + PIECE_KINDS[type(piece)] + 6 * piece.color.value
+    if isinstance(piece, Pawn) and piece.first_move:
+        code |= UNMOVED
+    return code
+
+
+# the FEN letter of each piece code less one, white pieces are upper case
+FEN_LETTERS = "PNBRQKpnbrqk"
+
+
+def fen_to_packed(fen: str) -> bytes:
+    """
+    will read a position in Forsyth-Edwards Notation into the 65 bytes Game.pack writes. Only the piece placement
+    and the side to move are used, this game has no castling or en passant and keeps no move clocks. A pawn on its
+    starting rank still has its first move.
+
+    Parameters:
+        fen (str): the position, such as "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b - - 0 1"
+
+    Raises:
+        ValueError: when the placement or side to move is malformed, a pawn stands on the first or last rank,
+        either color does not have exactly one king, or the king of the side that just moved is in check
+
+    Returns:
+        bytes: the packed position
+    """
+    fields = fen.split()
+    if len(fields) < 2 or fields[1] not in ("w", "b"):
+        raise ValueError(f"A FEN needs a piece placement and a side to move of w or b: {fen!r}")
+    ranks = fields[0].split("/")
+    if len(ranks) != 8:
+        raise ValueError(f"A FEN placement needs 8 ranks: {fen!r}")
+    data = bytearray(65)
+    # the first rank written is the eighth, which is y = 0 on this board
+    for y, rank in enumerate(ranks):
+        x = 0
+        for char in rank:
+            if char in "12345678":
+                x += int(char)
+                continue
+            if char not in FEN_LETTERS or x > 7:
+                raise ValueError(f"Bad rank {rank!r} in FEN {fen!r}")
+            code = FEN_LETTERS.index(char) + 1
+            if char in "Pp":
+                if y in (0, 7):
+                    raise ValueError(f"A pawn cannot stand on the first or last rank: {fen!r}")
+                if y == (6 if char == "P" else 1):
+                    code |= UNMOVED
+            data[y * 8 + x] = code
+            x += 1
+        if x != 8:
+            raise ValueError(f"Rank {rank!r} does not have 8 squares in FEN {fen!r}")
+    for king in (FEN_LETTERS.index("K") + 1, FEN_LETTERS.index("k") + 1):
+        if data.count(king) != 1:
+            raise ValueError(f"Each color needs exactly one king: {fen!r}")
+    data[64] = Color.WHITE.value if fields[1] == "w" else Color.BLACK.value
+    # the same attack tables Game.check's attack map is built from, the side to move could take the king
+    from bitboard import Bitboards
+    if Bitboards.from_squares(data).in_check(Color.BLACK if fields[1] == "w" else Color.WHITE):
+        raise ValueError(f"The side that is not to move is in check: {fen!r}")
+    return bytes(data)
+
+
+def packed_to_fen(data: bytes) -> str:
+    """
+    will write a packed position in Forsyth-Edwards Notation, with no castling, no en passant square and the
+    move clocks at 0 and 1
+
+    Parameters:
+        data (bytes): the 65 bytes written by Game.pack
+
+    Returns:
+        str: the FEN of the position
+    """
+    ranks = []
+    for y in range(8):
+        rank = ""
+        empty = 0
+        for x in range(8):
+            code = data[y * 8 + x] & ~UNMOVED
+            if not code:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += FEN_LETTERS[code - 1]
+        ranks.append(rank + (str(empty) if empty else ""))
+    side = "w" if data[64] == Color.WHITE.value else "b"
+    return f"{'/'.join(ranks)} {side} - - 0 1"
+
+
 class Game:
-    def __init__(self) -> None:
+    # the move generators a game can run on
+    BACKENDS = ("pieces", "bitboard")
+    # how many positions' legal moves are remembered
+    LEGAL_CACHE_SIZE = 512
+
+    def __init__(self, backend: str = "pieces") -> None:
         """
         Jack Bellgowan and Tim Lightner and Connor Ostrowski
         sets the default state of the game,
         it sets _current_player to white,
         it sets the default board and makes the _boardStack
 
+        Parameters:
+            backend (str): "pieces" to generate moves with the piece classes or "bitboard" to use the bitboard
+                generator, both give the same moves
+
+        Raises:
+            ValueError: when the backend is not one of Game.BACKENDS
+
         Returns: None
         """
+        if backend not in Game.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {Game.BACKENDS}.")
+        self._backend: str = backend
+        # bit sets of the current board, built when the bitboard backend first needs them
+        self._bitboards = None
+        # the computer's search engine, made when the computer first moves
+        self._engine = None
+        # positions mate() has already answered, made on the first call
+        self._table = None
+        # legal moves by (position key, color), the least recently used position is dropped first
+        self._legal_cache: OrderedDict = OrderedDict()
         self._current_player: Color = Color.WHITE
         self.setBoardDefault()
         self._boardStack: Game.BoardStack = Game.BoardStack()
@@ -654,6 +844,173 @@ class Game:
         """
         return self._board
 
+    @property
+    def position_hash(self) -> int:
+        """
+        getter for _hash, the Zobrist key of the board and the player to move. move, undo and switch_player
+        keep it up to date, so positions reached by different move orders get the same key
+        returns:
+        _hash (int): the 64 bit key of the current position
+        """
+        return self._hash
+
+    @property
+    def score(self) -> int:
+        """
+        getter for _score, the material and piece-square value of the board from white's side. move and undo
+        keep it up to date, see evaluation for the values
+        returns:
+        _score (int): the total in centipawns, positive when white is ahead
+        """
+        return self._score
+
+    @property
+    def attack_map(self):
+        """
+        getter for _attack_map, which squares each color attacks, kept up to date by move and undo
+        returns:
+        _attack_map (AttackMap): the attack map of the board
+        """
+        return self._attack_map
+
+    @property
+    def table(self):
+        """
+        getter for the transposition table mate() stores its answers in, it is made on the first call
+
+        Returns:
+            _table (TranspositionTable): the game's table
+        """
+        if self._table is None:
+            from transposition import TranspositionTable
+            self._table = TranspositionTable(megabytes=4)
+        return self._table
+
+    @property
+    def backend(self) -> str:
+        """
+        getter for _backend
+        returns:
+        _backend (str): the name of the move generator the game runs on
+        """
+        return self._backend
+
+    def bitboards(self):
+        """
+        will return the current board as bit sets, they are built once per position and thrown away when a
+        move, undo or reset changes the board
+
+        Returns:
+            Bitboards: the current position as bit sets
+        """
+        if self._bitboards is None:
+            from bitboard import Bitboards
+            self._bitboards = Bitboards.from_pieces(chain(self._pieces[Color.WHITE].items(),
+                                                          self._pieces[Color.BLACK].items()))
+        return self._bitboards
+
+    def valid_moves(self, y: int, x: int) -> list[tuple[int, int]]:
+        """
+        will return the valid moves of the piece at a location using the game's backend, the moves are the same
+        as the piece's own valid_moves
+
+        Parameters:
+            y (int): The y coordinate of the piece
+            x (int): The x coordinate of the piece
+
+        Returns:
+            moves (list[tuple[int,int]]): the moves of the piece, empty if there is no piece
+        """
+        piece = self.get(y, x)
+        if not piece:
+            return []
+        if self._backend == "bitboard":
+            return self.bitboards().valid_moves(y, x)
+        return piece.valid_moves(y, x)
+
+    def legal_moves(self, color: Color = None) -> tuple:
+        """
+        will return every move of a color that move() would accept. Pinned pieces and check evasions are worked
+        out before the moves are generated, so only legal moves are made and none is played to be tested. The
+        moves are worked out once per position and color and then kept by the position's key, so the board, the
+        search and the rules of one turn all share a single generation. Only move, undo and reset change the key.
+
+        Parameters:
+            color (Color): the color to move, the current player when not given
+
+        Returns:
+            moves (tuple[tuple[tuple[int,int],tuple[int,int]]]): ((y, x), (y2, x2)) pairs
+        """
+        return self._legal_entry(color)[0]
+
+    def legal_captures(self, color: Color = None) -> list:
+        """
+        will return the legal moves of a color that take an enemy piece, generated on the bit sets of the position
+        with the same pins and check evasions as legal_moves. They are not cached since the search only asks for
+        them once per position.
+
+        Parameters:
+            color (Color): the color to move, the current player when not given
+
+        Returns:
+            moves (list[tuple[tuple[int,int],tuple[int,int]]]): ((y, x), (y2, x2)) pairs
+        """
+        return self.bitboards().legal_moves(color or self._current_player, True)
+
+    def legal_moves_from(self, y: int, x: int) -> tuple:
+        """
+        will return the squares the piece at a location can legally move to, from the same cache as legal_moves
+
+        Parameters:
+            y (int): The y coordinate of the piece
+            x (int): The x coordinate of the piece
+
+        Returns:
+            moves (tuple[tuple[int,int]]): the (y, x) positions the piece can move to, empty if there is no piece
+        """
+        piece = self.get(y, x)
+        if not piece:
+            return ()
+        return self._legal_entry(piece.color)[1].get((y, x), ())
+
+    def _legal_entry(self, color: Color) -> tuple:
+        """
+        looks the legal moves of a color up in the cache, generating them on a miss
+
+        Parameters:
+            color (Color): the color to move, the current player when None
+
+        Returns:
+            tuple: the moves as pairs and the same moves as a dict of destinations by starting square
+        """
+        if color is None:
+            color = self._current_player
+        key = (self._hash, color)
+        entry = self._legal_cache.get(key)
+        if entry is not None:
+            self._legal_cache.move_to_end(key)
+            return entry
+        if self._backend == "bitboard":
+            moves = self.bitboards().legal_moves(color)
+        else:
+            # the piece classes give the moves and the king's safe squares, the check lines and the pins decide
+            # which of them are legal, so no move is tried on the board
+            king, safe, allowed, pinned = self.bitboards().legal_masks(color)
+            moves = []
+            for (y, x), piece in self.get_pieces(color):
+                sq = y * 8 + x
+                mask = safe if sq == king else allowed & pinned.get(sq, -1)
+                if mask:
+                    moves += [((y, x), (y2, x2)) for y2, x2 in piece.valid_moves(y, x) if mask >> (y2 * 8 + x2) & 1]
+        by_square: dict = {}
+        for start, end in moves:
+            by_square.setdefault(start, []).append(end)
+        entry = (tuple(moves), {start: tuple(ends) for start, ends in by_square.items()})
+        self._legal_cache[key] = entry
+        if len(self._legal_cache) > Game.LEGAL_CACHE_SIZE:
+            self._legal_cache.popitem(last=False)
+        return entry
+
     def setBoardDefault(self) -> None:
         """
         Sets board in default state
@@ -663,8 +1020,146 @@ class Game:
         self._current_player = Color.WHITE
         # sets board to 2d 8x8 list of None
         self._board: list[list] = [[None for _ in range(8)] for _ in range(8)]
+        self._bitboards = None
+        # the packed position the move history starts from, None for the standard start
+        self._start_position = None
         # places pieces in default locations
         self._setup_pieces()
+        self._index_board()
+
+    def pack(self) -> bytes:
+        """
+        will write the position into 65 bytes, one for each square in y * 8 + x order as given by piece_code and
+        one for the player to move. The bytes are small enough to hand to other processes.
+
+        Returns:
+            bytes: the packed position
+        """
+        data = bytearray(65)
+        for color in Color:
+            for (y, x), piece in self._pieces[color].items():
+                data[y * 8 + x] = piece_code(piece)
+        data[64] = self._current_player.value
+        return bytes(data)
+
+    @classmethod
+    def unpack(cls, data: bytes, backend: str = "pieces") -> 'Game':
+        """
+        will make a new game in a position written by pack, with nothing to undo
+
+        Parameters:
+            data (bytes): the packed position
+            backend (str): the move generator the new game runs on
+
+        Raises:
+            ValueError: when the data is not 65 bytes or holds an unknown piece
+
+        Returns:
+            game (Game): a game in the position
+        """
+        if len(data) != 65:
+            raise ValueError("A packed position must be 65 bytes long.")
+        board: list[list] = [[None for _ in range(8)] for _ in range(8)]
+        for sq in range(64):
+            code = data[sq] & ~UNMOVED
+            if not code:
+                continue
+            if code > 12:
+                raise ValueError(f"Unknown piece code {code} in packed position.")
+            y, x = divmod(sq, 8)
+            color = Color((code - 1) // 6)
+            piece_class = PIECE_CLASSES[(code - 1) % 6]
+            if piece_class is Pawn:
+                board[x][y] = Pawn(color, board, bool(data[sq] & UNMOVED))
+            else:
+                board[x][y] = piece_class(color, board)
+        game = cls(backend)
+        game._load_board(board, Color(data[64]))
+        return game
+
+    @classmethod
+    def from_fen(cls, fen: str, backend: str = "pieces") -> 'Game':
+        """
+        will make a new game in a position given in Forsyth-Edwards Notation, with nothing to undo
+
+        Parameters:
+            fen (str): the position, see fen_to_packed for what is read
+            backend (str): the move generator the new game runs on
+
+        Raises:
+            ValueError: when the FEN is not a position this game can play
+
+        Returns:
+            game (Game): a game in the position
+        """
+        return cls.unpack(fen_to_packed(fen), backend)
+
+    def to_fen(self) -> str:
+        """
+        will write the current position in Forsyth-Edwards Notation
+
+        Returns:
+            str: the FEN of the position
+        """
+        return packed_to_fen(self.pack())
+
+    def _load_board(self, board: list[list], player: Color) -> None:
+        """
+        Replaces the board and the player to move, the move history and the cached moves are dropped
+        returns None
+        """
+        self._board = board
+        self._current_player = player
+        self._bitboards = None
+        self._boardStack = Game.BoardStack()
+        self._legal_cache.clear()
+        self._index_board()
+        self._start_position = self.pack()
+
+    def move_log(self) -> tuple:
+        """
+        will list the moves played since the game started or was loaded, undone moves are not in it
+
+        Returns:
+            tuple[tuple[tuple[int,int],tuple[int,int]]]: the ((y, x), (y2, x2)) moves in the order they were played
+        """
+        return tuple(((record.y, record.x), (record.y2, record.x2)) for record in self._boardStack.records())
+
+    @property
+    def start_position(self) -> bytes:
+        """
+        getter for _start_position, where the move log starts
+
+        Returns:
+            _start_position (bytes): the position as Game.pack writes it, None when the game began from the
+            standard start
+        """
+        return self._start_position
+
+    def _index_board(self) -> None:
+        """
+        Builds the attack map, the piece lists and finds the kings for the whole board, move and undo keep them
+        up to date after this
+        returns None
+        """
+        from attack_map import AttackMap
+        from zobrist import KEYS
+        from evaluation import board_score, piece_score
+        self._attack_map = AttackMap(self._board)
+        self._keys = KEYS
+        self._hash: int = KEYS.position(self._board, self._current_player == Color.BLACK)
+        # the material and square values of the board from white's side, changed like the key on every move
+        self._piece_score = piece_score
+        self._score: int = board_score(self._board)
+        self._kings: dict[Color, tuple[int, int]] = {Color.WHITE: None, Color.BLACK: None}
+        # the pieces of each color by their (y, x) location
+        self._pieces: dict[Color, dict[tuple[int, int], Piece]] = {Color.WHITE: {}, Color.BLACK: {}}
+        for x, col in enumerate(self._board):
+            for y, piece in enumerate(col):
+                if piece:
+                    self._pieces[piece.color][(y, x)] = piece
+                if isinstance(piece, King):
+                    self._kings[piece.color] = (y, x)
 
     def _setup_pieces(self) -> None:
         """
@@ -739,6 +1234,7 @@ class Game:
         returns: None
         """
         self._current_player = Color.BLACK if self._current_player == Color.WHITE else Color.WHITE
+        self._hash ^= self._keys.side
 
     def reset(self) -> None:
         """
@@ -747,11 +1243,14 @@ class Game:
         """
         # sets board to default
         self.setBoardDefault()
+        self._legal_cache.clear()
+        # the old moves belong to the old board
+        self._boardStack = Game.BoardStack()
 
     def undo(self, player_called: bool = True) -> bool:
         """
         undo will allow a player to erase their last move and will move the piece and the black piece
-        back to the position it was before
+        back to the position it was before. Only the squares the move changed are put back.
 
         Returns:
             bool: if an undo operation can be done.
@@ -759,13 +1258,36 @@ class Game:
         # checks if an item can be popped
         if self._boardStack.length() != 0:
             self.switch_player()
-            # sets the board to last state
-            self._board = self._boardStack.pop()
+            record = self._boardStack.pop()
+            # takes what stands on the new position out of the key before the pawn gets its first move back
+            self._hash ^= self._keys.piece(self._board[record.x2][record.y2], record.y2, record.x2)
+            self._score -= self._piece_score(self._board[record.x2][record.y2], record.y2, record.x2)
+            # puts the moved piece back and returns whatever was captured, this also removes a promoted queen
+            self._board[record.x][record.y] = record.piece
+            self._board[record.x2][record.y2] = record.captured
+            if isinstance(record.piece, Pawn):
+                record.piece.first_move = record.first_move
+            self._hash ^= (self._keys.piece(record.piece, record.y, record.x)
+                           ^ self._keys.piece(record.captured, record.y2, record.x2))
+            self._score += (self._piece_score(record.piece, record.y, record.x)
+                            + self._piece_score(record.captured, record.y2, record.x2))
+            self._bitboards = None
+            self._attack_map.update(record.y * 8 + record.x, record.y2 * 8 + record.x2)
+            pieces = self._pieces[record.piece.color]
+            del pieces[(record.y2, record.x2)]
+            pieces[(record.y, record.x)] = record.piece
+            if record.captured:
+                self._pieces[record.captured.color][(record.y2, record.x2)] = record.captured
+            if isinstance(record.piece, King):
+                self._kings[record.piece.color] = (record.y, record.x)
+            if isinstance(record.captured, King):
+                self._kings[record.captured.color] = (record.y2, record.x2)
             # success undoing
             if player_called:
                 self.undo(False)
             return True
-        self._current_player = Color.WHITE
+        if self._current_player != Color.WHITE:
+            self.switch_player()
         # failure undoing
         return False
 
@@ -806,7 +1328,7 @@ class Game:
 
     def move(self, piece: Piece, y: int, x: int, y2: int, x2: int) -> bool:
         """
-        will first copy the board and then set a new location for a piece and then will
+        will first record what the move changes and then set a new location for a piece and then will
         remove the old position It will return a bool that is if the new state will put the player
         in check and if it does then the move can not happen. No move can be done if it puts the
         player in check.
@@ -821,10 +1343,17 @@ class Game:
         Returns:
             bool: if the play does or does not put the player in check
         """
-        # copies board onto stack
-        self._boardStack.push(self.copy_board())
+        # records only what the move changes so undo can put it back
+        captured = self._board[x2][y2]
+        promotion = isinstance(piece, Pawn) and y2 == (0 if piece.color == Color.WHITE else 7)
+        self._boardStack.push(Game.MoveRecord(piece, y, x, y2, x2, captured, promotion,
+                                              piece.first_move if isinstance(piece, Pawn) else False, self._hash))
+        # takes the piece and anything it captures out of the key while the pawn still has its first move
+        self._hash ^= self._keys.piece(piece, y, x) ^ self._keys.piece(captured, y2, x2)
+        self._score -= self._piece_score(piece, y, x) + self._piece_score(captured, y2, x2)
         # sets old location to None
         self._board[x][y] = None
+        self._bitboards = None
         # checks if piece is a pawn for special behavior
         if isinstance(piece, Pawn):
             # sets first move to false for 2 space first move
@@ -840,6 +1369,20 @@ class Game:
         else:
             # if piece is not a pawn
             self._board[x2][y2] = piece
+        self._hash ^= self._keys.piece(self._board[x2][y2], y2, x2)
+        self._score += self._piece_score(self._board[x2][y2], y2, x2)
+        # only the two squares changed, the attack map, piece lists and king index follow them
+        self._attack_map.update(y * 8 + x, y2 * 8 + x2)
+        if captured:
+            del self._pieces[captured.color][(y2, x2)]
+        pieces = self._pieces[piece.color]
+        del pieces[(y, x)]
+        # a promoted pawn is listed as its queen
+        pieces[(y2, x2)] = self._board[x2][y2]
+        if isinstance(piece, King):
+            self._kings[piece.color] = (y2, x2)
+        if isinstance(captured, King):
+            self._kings[captured.color] = None
         # if move results in check
         if self.check(piece.color):
             # undoes move
@@ -852,75 +1395,70 @@ class Game:
         # successful move
         return True
 
-    def get_piece_locations(self, color: Color) -> list[tuple[int, int]]:
+    def get_piece_locations(self, color: Color):
+        """
+        this method will find the all of the locations of a ceritan color. The locations come from the piece
+        list that move and undo keep up to date, and are returned as a live view so that nothing is copied
+        when the caller only loops over them. Callers that move pieces while looping must copy it with list()
+        first.
+
+        Parameters:
+            color (Color): the color of pieces to find
+
+        Returns:
+            piece_list (KeysView[tuple[int,int]]): all locations of pieces of a certian color in form (Y,X)
         """
-        this method will find the all of the locations of a ceritan color
+        return self._pieces[color].keys()
+
+    def get_pieces(self, color: Color):
+        """
+        will return the pieces of a color together with their locations, as a live view like get_piece_locations
 
         Parameters:
             color (Color): the color of pieces to find
 
         Returns:
-            piece_list (list[tuple[int,int]]): all locations of pieces of a certian color
-        """
-        # returns in form (Y,X)
-        piece_list = []
-        # loops over each current row
-        for n_col, col in enumerate(self._board):
-            # loops over each current item
-            for n_row, item in enumerate(col):
-                # checks if the item is the correct color
-                if item and item.color == color:
-                    piece_list.append((n_row, n_col))
-        # returns the list
-        return piece_list
+            pieces (ItemsView[tuple[int,int],Piece]): ((y, x), piece) pairs of a certian color
+        """
+        return self._pieces[color].items()
 
     def find_king(self, color: Color) -> tuple[int, int]:
         """
-        this method will find the King of a given color
+        this method will find the King of a given color, the location is kept up to date by move and undo so
+        no search of the board is needed
 
         Parameters:
             color (Color): which king in the game to find
 
         Returns:
-            piece_location (tuple[int,int]): the position of the king
+            piece_location (tuple[int,int]): the position of the king, None if there is no king of that color
         """
-
-        # gets locations of pieces
-        locations = self.get_piece_locations(color)
-        # checks each piece
-        for piece_location in locations:
-            if isinstance(self.get(piece_location[0], piece_location[1]), King):
-                # checks if the piece is of type King
-                return piece_location
+        return self._kings[color]
 
     def check(self, color: Color) -> bool:
         """
         check will determine if the possible moves of the color will put the other king in check
-        it uses the current positions and valid_moves() to see if any moves will complete this action
+        it looks the king's square up in the attack map, which holds every square the enemy's valid_moves()
+        could capture on, so nothing has to be generated
         Parameters:
             color (Color): which color to check if a king is in check
 
         Returns:
             bool: returns true or false if a king is in check
         """
+        king = self._kings[color]
+        if king is None:
+            return False
         # sets the enemy color to the opposite of its own
-        enemy_color = Color.BLACK if color == Color.WHITE else color.WHITE
-        # gets all the enemy piece locations as tuple(y, x) and puts them in the list
-        enemy_pieces_list = self.get_piece_locations(enemy_color)
-        king = self.find_king(color)
-        # Finds what class of piece each location is and makes a list of their valid moves
-        for piece in enemy_pieces_list:
-            if king in self.get(piece[0], piece[1]).valid_moves(piece[0], piece[1]):
-                return True
-        # returns false
-        return False
+        enemy_color = Color.BLACK if color == Color.WHITE else Color.WHITE
+        return self._attack_map.attacked(king[0] * 8 + king[1], enemy_color.value)
 
 
     def mate(self, color: Color) -> bool:
         """
         will see if a given color will check if a king is in check and there are no more moves for a king
-        to complete. if that is the case the game will be over. It calls the check method and finds all
-        the possible moves to determine if a king can escape and not be in check.
+        to complete. if that is the case the game will be over. It calls the check method and has_legal_move to
+        determine if the king can escape, which never plays a move on the board.
 
         Parameters:
             color (Color): the color of the king
@@ -929,157 +1467,182 @@ class Game:
             bool: if the king of the color parameter is in check 
         """
         # checks if king is in check
-        if not self.check(color):
-            return False
-        # gets king and possible king moves
-        king = self.find_king(color)
-        king_moves = self.get(king[0], king[1]).valid_moves(king[0], king[1])
-        # loops through each move
-        for king_move in king_moves:
-            # tries each move to see if the king is in check
-            self.move(self.get(king[0], king[1]), king[0], king[1], king_move[0], king_move[1])
-            # returns false and undoes the move if the king is in not in check
-            if not self.check(color):
-                self.undo(False)
-                return False
-        for piece in self.get_piece_locations(color):
-            for move in self.get(piece[0], piece[1]).valid_moves(piece[0], piece[1]):
-                self.move(self.get(piece[0], piece[1]), piece[0], piece[1], move[0], move[1])
-                # returns false and undoes the move if the king is in not in check
-                if not self.check(color):
-                    self.undo(False)
-                    return False
-        return True
+        return self.check(color) and not self.has_legal_move(color)
 
-    def _computer_move(self):
+    def stalemate(self, color: Color) -> bool:
         """
-        Computer over helps the AI to play smarter by giving a set a rules to play by. It will first determine what moves
-        are avaible to move the black pieces. it will then choose to move in the following order: checkmate, check, capture
-        a queen, capture a bishop, capture knight, capture rook, capture a pawn, if it can not capture any white pieces
-        it will preform a rando move.
+        will see if a color is not in check but has no legal move
 
-        Returns: None
+        Parameters:
+            color (Color): the color to test
+
+        Returns:
+            bool: if the color is stalemated
         """
-        assert self.current_player == Color.BLACK
-        # value of each move
-        moves = {
-            "MATE": 7,
-            "CHECK": 6,
-            "QUEEN": 5,
-            "BISHOP": 4,
-            "KNIGHT": 3,
-            "ROOK": 2,
-            "PAWN": 1,
-            "RANDOM": 0,
-        }
-        best_move = moves["RANDOM"]
-        move_data = None
-        # if Black is in check
-        if self.check(Color.BLACK):
-            # find the black king
-            king = self.find_king(Color.BLACK)
-            king_moves = self.get(king[0], king[1]).valid_moves(king[0], king[1])
-            # loops through each move
-            for king_move in king_moves:
-                # tries each move to see if the king is in check
-                self.move(self.get(king[0], king[1]), king[0], king[1], king_move[0], king_move[1])
-                # returns false and undoes the move if the king is in not in check
-                if not self.check(Color.BLACK):
-                    return f"BLACK is in CHECK!\nBLACK moved King\n"
-            for piece in self.get_piece_locations(Color.BLACK):
-                for move in self.get(piece[0], piece[1]).valid_moves(piece[0], piece[1]):
-                    piece_type = self.get(piece[0], piece[1])
-                    self.move(piece_type, piece[0], piece[1], move[0], move[1])
-                    # returns false and undoes the move if the king is in not in check
-                    if not self.check(Color.BLACK):
-                        return f"BLACK is in CHECK!\nBLACK moved {piece_type.__class__.__name__}\n"
-        for cords in self.get_piece_locations(Color.BLACK):
-            # get piece
-            piece = self.get(cords[0], cords[1])
-            # every move that piece can make
-            current_moves = piece.valid_moves(cords[0], cords[1])
-            # loop through every move
-            for move in current_moves:
-                # get piece captured
-                spot_taken = self.get(move[0], move[1])
-                # check for self mate or check
-                if self.move(piece, cords[0], cords[1], move[0], move[1]):
-                    # check for enemy mate
-                    if self.mate(Color.WHITE):
-                        # new best move
-                        move_data = (piece, move, cords)
-                        best_move = moves["MATE"]
-                    # check for enemy check
-                    elif self.check(Color.WHITE) and best_move <= 6:
-                        # new best move
-                        move_data = (piece, move, cords)
-                        best_move = moves["CHECK"]
-                    # undo board
-                    self.undo(False)
-                else:
-                    # the move will lead to check or checkmate
-                    continue
-                # move will take queen
-                if isinstance(spot_taken, Queen) and best_move <= 5:
-                    move_data = (piece, move, cords)
-                    best_move = moves["QUEEN"]
-                # move will take bishop
-                elif isinstance(spot_taken, Bishop) and best_move <= 4:
-                    move_data = (piece, move, cords)
-                    best_move = moves["BISHOP"]
-                # move will take knight
-                elif isinstance(spot_taken, Knight) and best_move <= 3:
-                    move_data = (piece, move, cords)
-                    best_move = moves["KNIGHT"]
-                # move will take rook
-                elif isinstance(spot_taken, Rook) and best_move <= 2:
-                    move_data = (piece, move, cords)
-                    best_move = moves["ROOK"]
-                # move will take pawn
-                elif isinstance(spot_taken, Pawn) and best_move <= 1:
-                    move_data = (piece, move, cords)
-                    best_move = moves["PAWN"]
-        if not move_data:
-            locations = self.get_piece_locations(Color.BLACK)
-            cords = random.choice(locations)
-            piece = self.get(cords[0], cords[1])
-            moves = piece.valid_moves(cords[0], cords[1])
-            while not moves:
-                cords = random.choice(locations)
-                piece = self.get(cords[0], cords[1])
-                moves = piece.valid_moves(cords[0], cords[1])
-            move_data = (piece, random.choice(moves), cords)
-        self.move(move_data[0], move_data[2][0], move_data[2][1], move_data[1][0], move_data[1][1])
-        if self.current_player == Color.BLACK:
-            self.switch_player()
-        return f"BLACK moved {move_data[0].__class__.__name__}\n"
+        return not self.check(color) and not self.has_legal_move(color)
+
+    def has_legal_move(self, color: Color) -> bool:
+        """
+        will determine if a color has any legal move. It is worked out on the position's bit sets from checks and
+        pins, so no move is played, and the answer is remembered in the transposition table by the position's key.
+
+        Parameters:
+            color (Color): the color to test
+
+        Returns:
+            bool: if the color has at least one legal move
+        """
+        # a position that was answered before is looked up by its key
+        key = self._hash ^ self._keys.mate[color.value]
+        entry = self.table.probe(key)
+        if entry is not None:
+            return entry.score == 1
+        movable = self.bitboards().has_legal_move(color)
+        self.table.store(key, 0, int(movable), self.table.EXACT)
+        return movable
+
+    def outcome(self) -> Outcome:
+        """
+        will determine if the game is over for the player to move and why. Repetitions and the fifty move count
+        only look at the moves played in this game, not at moves before a position was loaded.
 
+        Returns:
+            Outcome: ONGOING while the game goes on
+        """
+        color = self._current_player
+        if not self.has_legal_move(color):
+            return Outcome.CHECKMATE if self.check(color) else Outcome.STALEMATE
+        if self._insufficient_material():
+            return Outcome.INSUFFICIENT_MATERIAL
+        quiet = 0
+        repeats = 0
+        # only the moves since the last pawn move or capture can lead back to this position
+        for record in reversed(self._boardStack.records()):
+            if isinstance(record.piece, Pawn) or record.captured:
+                break
+            quiet += 1
+            if record.key == self._hash:
+                repeats += 1
+        if repeats >= 2:
+            return Outcome.REPETITION
+        if quiet >= 100:
+            return Outcome.FIFTY_MOVES
+        return Outcome.ONGOING
+
+    def _insufficient_material(self) -> bool:
+        # bare kings, a king and one minor piece against a king, or bishops that all stand on one square color
+        others = [(location, piece) for color in Color for location, piece in self._pieces[color].items()
+                  if not isinstance(piece, King)]
+        if not others:
+            return True
+        if len(others) == 1:
+            return isinstance(others[0][1], (Knight, Bishop))
+        return all(isinstance(piece, Bishop) for _, piece in others) and \
+            len({(y + x) % 2 for (y, x), _ in others}) == 1
+
+    @property
+    def engine(self):
+        """
+        getter for the search engine the computer plays with, a search.Searcher with the default budget is made
+        the first time it is needed
+
+        Returns:
+            _engine (Searcher): the computer's search engine
+        """
+        if self._engine is None:
+            from search import Searcher
+            self._engine = Searcher()
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine) -> None:
+        """
+        setter for the search engine the computer plays with
+
+        Parameters:
+            engine (Searcher): anything with a search(game) method returning a search.SearchResult
+        """
+        self._engine = engine
+
+    def _computer_move(self, result=None):
+        """
+        Computer move plays for the player to move, black against the gui's player and either color in self-play.
+        It searches the position with the game's engine, an alpha-beta search that looks several moves ahead
+        within a fixed time budget, and plays the best move it finds.
+
+        Parameters:
+            result (SearchResult): a search of the current position that was already run, for example in
+                another thread, None to search now
+
+        Returns:
+            str: a message saying what the player moved, None if they have no legal move
+        """
+        color = self.current_player
+        in_check = self.check(color)
+        if result is None:
+            result = self.engine.search(self)
+        if result.move is None:
+            return None
+        (y, x), (y2, x2) = result.move
+        piece = self.get(y, x)
+        self.move(piece, y, x, y2, x2)
+        message = f"{color.name} moved {piece.__class__.__name__}\n"
+        return f"{color.name} is in CHECK!\n" + message if in_check else message
+
+
+    class MoveRecord(NamedTuple):
+        """
+        what a single move changed on the board, enough for undo to put it back without a copy of the board
+
+        Attributes:
+            piece (Piece): the piece that moved
+            y (int): the old y position of the piece
+            x (int): the old x position of the piece
+            y2 (int): the new y position of the piece
+            x2 (int): the new x position of the piece
+            captured (Piece): the piece that was on the new position, None if it was empty
+            promotion (bool): if the piece was a pawn that became a queen
+            first_move (bool): the pawn's first_move flag before the move, False for other pieces
+            key (int): the position's Zobrist key before the move, used to find repeated positions
+        """
+        piece: Piece
+        y: int
+        x: int
+        y2: int
+        x2: int
+        captured: Piece
+        promotion: bool
+        first_move: bool
+        key: int
 
     class BoardStack:
         """
-        a board stack is needed for the undo method to hold all of the data of previous moves and states of the baord
-        in case the player wants to go back on a move they made previously.
+        a board stack is needed for the undo method to hold all of the data of previous moves in case the player
+        wants to go back on a move they made previously. It holds one MoveRecord per move.
         """
         def __init__(self) -> None:
-            self._data: list[list] = []
+            self._data: list = []
 
         def length(self) -> int:
             return len(self._data)
 
-        def peek(self) -> list[list]:
+        def peek(self) -> 'Game.MoveRecord':
             if not self._data:
                 raise ValueError("Cannot peek from an empty stack")
             return self._data[-1]
 
-        def pop(self) -> list[list]:
+        def pop(self) -> 'Game.MoveRecord':
             if not self._data:
                 raise ValueError("Cannot pop from an empty stack")
             data = self.peek()
             del self._data[-1]
             return data
 
-        def push(self, board: list[list]) -> None:
-            self._data.append(board)
+        def push(self, record: 'Game.MoveRecord') -> None:
+            self._data.append(record)
+
+        def records(self) -> tuple:
+            return tuple(self._data)
 
 
 def __main__():
@@ -1087,4 +1650,4 @@ def __main__():
 
 
 if __name__ == '__main__':
-    __main__()
\ No newline at end of file
+    __main__()
\ No newline at end of file
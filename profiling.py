@@ -0,0 +1,201 @@
+import functools
+import json
+import time
+from bitboard import Bitboards
+from piece_model import Game, PIECE_CLASSES
+from search import Searcher
+
+
+class Profiler:
+    """
+    Counters on the hot paths of the game: calls and cumulative time of each hooked function, the nodes the
+    searches visited, the boards that were copied, and the hit rates of the legal move cache and the
+    transposition tables.
+
+    Nothing is counted until enable is called. Enabling puts a counting wrapper in place of each hooked method on
+    its class and disabling puts the original method back, so a disabled profiler leaves no code on the hot paths
+    at all. The times of a method include the hooked methods it calls, and counts made from several threads at
+    once can be a little short since the counters are not locked.
+
+    Attributes:
+        _hooks (list[tuple[type,str,str]]): the class, method name and counter name of each hooked method
+        _originals (dict[tuple[type,str],object]): the methods that were replaced, empty while disabled
+        _calls (dict[str,int]): the calls of each counter
+        _seconds (dict[str,float]): the cumulative time of each counter
+        _values (dict[str,int]): the other counts, such as nodes and cache hits
+        _started (float): when the counters were last enabled or reset
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor for a disabled profiler with every count at zero
+        """
+        self._hooks = [(Game, name, "Game." + name) for name in
+                       ("move", "undo", "copy_board", "pack", "check", "mate", "stalemate", "has_legal_move",
+                        "outcome", "valid_moves", "legal_moves", "_legal_entry", "legal_captures",
+                        "_computer_move")]
+        # the piece classes' own move generators are counted together
+        self._hooks += [(piece_class, "valid_moves", "Piece.valid_moves") for piece_class in PIECE_CLASSES]
+        self._hooks += [(Bitboards, "from_pieces", "Bitboards.from_pieces"), (Searcher, "search", "Searcher.search")]
+        self._originals: dict = {}
+        self._calls: dict = {}
+        self._seconds: dict = {}
+        self._values: dict = {}
+        self._started = time.perf_counter()
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        getter for if the hooks are in place
+
+        Returns:
+            bool: true while counting
+        """
+        return bool(self._originals)
+
+    def reset(self) -> None:
+        """
+        will set every count back to zero
+        """
+        # the dicts are changed in place since the wrappers of an enabled profiler hold on to them
+        self._calls.update((name, 0) for _, _, name in self._hooks)
+        self._seconds.update((name, 0.0) for _, _, name in self._hooks)
+        self._values.update(dict.fromkeys(("nodes", "board_copies", "legal_cache_hits", "legal_cache_misses",
+                                           "table_probes", "table_hits"), 0))
+        self._started = time.perf_counter()
+
+    def enable(self) -> None:
+        """
+        will put the counting wrappers in place, enabling twice changes nothing
+        """
+        if self.enabled:
+            return
+        for owner, method, name in self._hooks:
+            # a static or class method is read from the class dict so it can be put back as it was
+            original = owner.__dict__[method]
+            self._originals[(owner, method)] = original
+            setattr(owner, method, self._wrap(original, name))
+        self._started = time.perf_counter()
+
+    def disable(self) -> None:
+        """
+        will put every original method back, the counts are kept until reset
+        """
+        for (owner, method), original in self._originals.items():
+            setattr(owner, method, original)
+        self._originals = {}
+
+    def _wrap(self, original, name: str):
+        # a wrapper that times the method and counts its call, with the extra counts some methods have
+        calls, seconds, values = self._calls, self._seconds, self._values
+        wrapped_static = isinstance(original, (staticmethod, classmethod))
+        function = original.__func__ if wrapped_static else original
+        if name == "Searcher.search":
+            @functools.wraps(function)
+            def counted(searcher, game):
+                probes, hits = searcher.table.probes, searcher.table.hits
+                start = time.perf_counter()
+                try:
+                    result = function(searcher, game)
+                finally:
+                    seconds[name] += time.perf_counter() - start
+                    calls[name] += 1
+                    values["table_probes"] += searcher.table.probes - probes
+                    values["table_hits"] += searcher.table.hits - hits
+                values["nodes"] += result.nodes
+                return result
+        elif name == "Game._legal_entry":
+            @functools.wraps(function)
+            def counted(game, color):
+                if (game.position_hash, color or game.current_player) in game._legal_cache:
+                    values["legal_cache_hits"] += 1
+                else:
+                    values["legal_cache_misses"] += 1
+                start = time.perf_counter()
+                try:
+                    return function(game, color)
+                finally:
+                    seconds[name] += time.perf_counter() - start
+                    calls[name] += 1
+        else:
+            copies = name in ("Game.copy_board", "Game.pack")
+
+            @functools.wraps(function)
+            def counted(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    seconds[name] += time.perf_counter() - start
+                    calls[name] += 1
+                    if copies:
+                        values["board_copies"] += 1
+        return type(original)(counted) if wrapped_static else counted
+
+    def snapshot(self) -> dict:
+        """
+        will copy the counts as plain values that can be written as JSON
+
+        Returns:
+            dict: enabled, the elapsed seconds, the calls, seconds and mean microseconds of each counter that was
+            called, the nodes and board copies, and the hits, misses and hit rate of each cache
+        """
+        functions = {name: {"calls": calls, "seconds": self._seconds[name],
+                            "mean_us": self._seconds[name] / calls * 1e6}
+                     for name, calls in self._calls.items() if calls}
+        values = self._values
+
+        def rate(hits: int, total: int) -> float:
+            return hits / total if total else 0.0
+        legal_total = values["legal_cache_hits"] + values["legal_cache_misses"]
+        return {"enabled": self.enabled, "elapsed": time.perf_counter() - self._started, "functions": functions,
+                "nodes": values["nodes"], "board_copies": values["board_copies"],
+                "caches": {"legal_moves": {"hits": values["legal_cache_hits"],
+                                           "misses": values["legal_cache_misses"],
+                                           "hit_rate": rate(values["legal_cache_hits"], legal_total)},
+                           "transposition": {"hits": values["table_hits"],
+                                             "misses": values["table_probes"] - values["table_hits"],
+                                             "hit_rate": rate(values["table_hits"], values["table_probes"])}}}
+
+    def to_json(self, indent: int = 2) -> str:
+        """
+        Parameters:
+            indent (int): the indent of the JSON, None for one line
+
+        Returns:
+            str: the snapshot as JSON
+        """
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def report_lines(self, limit: int = 8) -> list[str]:
+        """
+        will lay the counts out for printing or for the GUI's overlay
+
+        Parameters:
+            limit (int): how many functions are listed, the ones with the most time first
+
+        Returns:
+            list[str]: the lines of the report
+        """
+        snapshot = self.snapshot()
+        caches = snapshot["caches"]
+        lines = [f"nodes {snapshot['nodes']}  copies {snapshot['board_copies']}  "
+                 f"legal cache {caches['legal_moves']['hit_rate']:.0%}  "
+                 f"table {caches['transposition']['hit_rate']:.0%}"]
+        ranked = sorted(snapshot["functions"].items(), key=lambda item: -item[1]["seconds"])
+        for name, counts in ranked[:limit]:
+            lines.append(f"{name:<22} {counts['calls']:>8}  {counts['seconds'] * 1000:9.1f} ms  "
+                         f"{counts['mean_us']:8.1f} us")
+        return lines
+
+    def __enter__(self) -> 'Profiler':
+        self.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+
+# the profiler of the process, shared by everything that turns counting on
+PROFILER = Profiler()
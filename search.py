@@ -0,0 +1,379 @@
+import time
+from typing import NamedTuple
+from piece_model import Color, Game, King, Queen, Bishop, Knight, Rook, Pawn
+from transposition import TranspositionTable
+from evaluation import evaluate
+
+# centipawn value of each piece, the king is never captured so it is only used for ordering
+PIECE_VALUES = {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 20000}
+# a score at or beyond MATE - MAX_PLY means a forced checkmate was found
+MATE = 100000
+INFINITY = 1000000
+MAX_PLY = 128
+
+# move ordering bands, a capture is always tried before a killer and a killer before any other quiet move
+_CAPTURE_ORDER = 1 << 30
+_KILLER_ORDER = 1 << 29
+
+
+class SearchResult(NamedTuple):
+    """
+    the outcome of a search
+
+    Attributes:
+        move (tuple[tuple[int,int],tuple[int,int]]): the best ((y, x), (y2, x2)) move, None if there is no legal move
+        score (int): the score of the move in centipawns for the side that moves
+        depth (int): the deepest iteration that was finished
+        nodes (int): the number of positions that were visited
+        elapsed (float): the time the search took in seconds
+    """
+    move: tuple
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+
+
+class _BudgetExceeded(Exception):
+    # raised inside the search when the time or node budget runs out
+    pass
+
+
+def _to_table(score: int, ply: int) -> int:
+    # mate scores are stored as the distance from the stored position, not from the root
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    # turns a stored mate score back into a distance from the root
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    Negamax search with alpha-beta pruning and iterative deepening. Every iteration goes one ply deeper than the
+    last, and the search stops at max_depth, when the time or node budget runs out, or when a mate is found. The
+    move of the last finished iteration is returned, so the answer only gets better with more budget.
+
+    Moves are ordered with the best move of the previous iteration first, then captures by most valuable victim
+    and least valuable attacker (MVV-LVA), then killer moves (quiet moves that caused a cutoff at the same ply)
+    and then the other quiet moves by their history score. Leaves are resolved with a capture-only quiescence
+    search so exchanges are not cut off halfway.
+
+    Every searched position is stored in a transposition table by its Zobrist key. A position reached again,
+    through another move order or in a later search, returns its stored score when it was searched deep enough
+    and otherwise has its stored best move tried first.
+
+    With an opening book, a position the book knows is answered from it without searching. With endgame tables,
+    a position they hold is answered from them at the root and scored from them anywhere in the tree.
+
+    Attributes:
+        max_depth (int): the deepest iteration to search
+        time_limit (float): the wall clock budget in seconds, None for no limit
+        node_limit (int): the budget in visited positions, None for no limit
+        table (TranspositionTable): the searched positions, kept from one search to the next
+        book (OpeningBook): the book played from before searching, None for no book
+        tablebases (Tablebases): the solved endings, None for none
+        cancel: an event shared with other threads or processes, such as a multiprocessing.Event, that stops the
+            search as a stop would once it is set, None for none
+    """
+
+    def __init__(self, max_depth: int = 64, time_limit: float = 1.0, node_limit: int = None,
+                 table: TranspositionTable = None, book=None, tablebases=None) -> None:
+        """
+        Constructor for a searcher, at least one of the limits should be set or the search only ends at max_depth
+
+        Parameters:
+            max_depth (int): the deepest iteration to search
+            time_limit (float): the wall clock budget in seconds, None for no limit
+            node_limit (int): the budget in visited positions, None for no limit
+            table (TranspositionTable): the table to use, a 16 megabyte one is made when not given
+            book (OpeningBook): the book to play from, None for no book
+            tablebases (Tablebases): the solved endings to play from, None for none
+
+        Raises:
+            ValueError: when max_depth is less than 1
+        """
+        if max_depth < 1:
+            raise ValueError("The search depth must be at least 1.")
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table = table if table is not None else TranspositionTable()
+        self.book = book
+        self.tablebases = tablebases
+        self.cancel = None
+        self._game = None
+        self._nodes = 0
+        self._deadline = None
+        self._killers: list[list] = []
+        self._history: dict = {}
+        self._stopped = False
+
+    def stop(self) -> None:
+        """
+        asks a search running in another thread to finish early, it returns the move of the last finished
+        iteration as if its budget had run out. The stop holds until a search returns, so one that comes just
+        before the search starts still ends it.
+        """
+        self._stopped = True
+
+    def clear_stop(self) -> None:
+        """
+        forgets a stop that no search has returned for, such as one that came after the search had finished
+        """
+        self._stopped = False
+
+    def search(self, game: Game) -> SearchResult:
+        """
+        will search the position for the side to move. The game is played on with move and undo during the search
+        and is back in the same position when this returns.
+
+        Parameters:
+            game (Game): the game to search
+
+        Returns:
+            SearchResult: the best move found and how the search went
+        """
+        try:
+            return self._search(game)
+        finally:
+            # the stop is used up by the search it ended
+            self._stopped = False
+
+    def _search(self, game: Game) -> SearchResult:
+        # the search itself, search clears the stop however this returns
+        start = time.perf_counter()
+        self._game = game
+        self._nodes = 0
+        self._deadline = None if self.time_limit is None else start + self.time_limit
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = {}
+        self.table.new_search()
+        color = game.current_player
+        root_moves = self._generate(color)
+        if not root_moves:
+            return SearchResult(None, -MATE if game.check(color) else 0, 0, 0, time.perf_counter() - start)
+        # a book move is played without a search, it has no score or depth
+        if self.book is not None:
+            move = self.book.probe(game)
+            if move is not None:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start)
+        # so is a solved ending, with its exact score
+        if self.tablebases is not None:
+            found = self.tablebases.best_move(game)
+            if found is not None:
+                return SearchResult(found[0], found[1], 0, 0, time.perf_counter() - start)
+        best_move, best_score, finished = root_moves[0], 0, 0
+        # a single reply needs no search
+        if len(root_moves) == 1:
+            return SearchResult(best_move, evaluate(game), 0, 0, time.perf_counter() - start)
+        entry = self.table.probe(game.position_hash)
+        root_moves = self._order(root_moves, 0, entry.move if entry else None)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, score = self._root(root_moves, depth)
+            except _BudgetExceeded:
+                break
+            best_move, best_score, finished = move, score, depth
+            self.table.store(game.position_hash, depth, _to_table(score, 0), TranspositionTable.EXACT, move)
+            # the next iteration starts with this iteration's best move
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) >= MATE - MAX_PLY:
+                break
+        return SearchResult(best_move, best_score, finished, self._nodes, time.perf_counter() - start)
+
+    def score_move(self, game: Game, move: tuple, depth: int, alpha: int = -INFINITY) -> int:
+        """
+        will score one move of the side to move, searched to a fixed depth. The table, killers and history are
+        cleared first so the score only depends on the position, the move, the depth and alpha, which lets scores
+        searched in different processes be compared.
+
+        Parameters:
+            game (Game): the game to search, it is back in the same position when this returns
+            move (tuple[tuple[int,int],tuple[int,int]]): the ((y, x), (y2, x2)) move to score
+            depth (int): how many plies to search, including the move
+            alpha (int): a score the side that moves already has, a move that can not beat it is only searched
+                far enough to show that and scores alpha
+
+        Raises:
+            ValueError: when the move is not legal
+
+        Returns:
+            int: the score of the move for the side that moves, or alpha when it is no better, None when the budget
+            ran out first
+        """
+        self._game = game
+        self._nodes = 0
+        self._deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = {}
+        self.table.clear()
+        (y, x), (y2, x2) = move
+        if not game.move(game.get(y, x), y, x, y2, x2):
+            raise ValueError(f"The move {move} is not legal.")
+        try:
+            return max(alpha, -self._negamax(depth - 1, -INFINITY, -alpha, 1))
+        except _BudgetExceeded:
+            return None
+        finally:
+            game.undo(False)
+            self._stopped = False
+
+    @property
+    def nodes(self) -> int:
+        """
+        getter for the number of positions visited by the last search
+
+        Returns:
+            int: the node count
+        """
+        return self._nodes
+
+    def _root(self, moves: list, depth: int) -> tuple:
+        # searches every root move with a full window narrowed by the best score so far
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        for move in moves:
+            (y, x), (y2, x2) = move
+            if not self._game.move(self._game.get(y, x), y, x, y2, x2):
+                continue
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                self._game.undo(False)
+            if score > alpha:
+                alpha, best_move = score, move
+        return best_move, alpha
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        # the score of the position for the side to move, within the alpha beta window
+        self._visit()
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiesce(alpha, beta, ply)
+        game = self._game
+        if self.tablebases is not None:
+            score = self.tablebases.score(game, ply)
+            if score is not None:
+                return min(max(score, alpha), beta)
+        key = game.position_hash
+        entry = self.table.probe(key)
+        first = None
+        if entry is not None:
+            first = entry.move
+            # a stored search that went deep enough answers the position, or at least narrows it
+            if entry.depth >= depth:
+                score = _from_table(entry.score, ply)
+                if entry.flag == TranspositionTable.EXACT:
+                    return min(max(score, alpha), beta)
+                if entry.flag == TranspositionTable.LOWER and score >= beta:
+                    return beta
+                if entry.flag == TranspositionTable.UPPER and score <= alpha:
+                    return alpha
+        color = game.current_player
+        legal = 0
+        best_move = None
+        flag = TranspositionTable.UPPER
+        for move in self._order(self._generate(color), ply, first):
+            (y, x), (y2, x2) = move
+            quiet = not game.get(y2, x2)
+            if not game.move(game.get(y, x), y, x, y2, x2):
+                continue
+            legal += 1
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo(False)
+            if score >= beta:
+                if quiet:
+                    self._store_killer(move, ply)
+                    history_key = (color, move)
+                    self._history[history_key] = self._history.get(history_key, 0) + depth * depth
+                self.table.store(key, depth, _to_table(beta, ply), TranspositionTable.LOWER, move)
+                return beta
+            if score > alpha:
+                alpha, best_move, flag = score, move, TranspositionTable.EXACT
+        if not legal:
+            # checkmate is scored by distance so the quickest mate is preferred, stalemate is a draw
+            alpha = -MATE + ply if game.check(color) else 0
+            flag = TranspositionTable.EXACT
+        self.table.store(key, depth, _to_table(alpha, ply), flag, best_move)
+        return alpha
+
+    def _quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        # only captures are searched, the side to move may also stand pat on the static score
+        stand = evaluate(self._game)
+        if stand >= beta:
+            return beta
+        if stand > alpha:
+            alpha = stand
+        if ply >= MAX_PLY - 1:
+            return alpha
+        game = self._game
+        captures = game.legal_captures(game.current_player)
+        for move in self._order(captures, ply, None):
+            (y, x), (y2, x2) = move
+            if not game.move(game.get(y, x), y, x, y2, x2):
+                continue
+            try:
+                self._visit()
+                score = -self._quiesce(-beta, -alpha, ply + 1)
+            finally:
+                game.undo(False)
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _generate(self, color: Color) -> list:
+        # only legal moves, pins and check evasions are worked out before the moves are made
+        return list(self._game.legal_moves(color))
+
+    def _order(self, moves: list, ply: int, first: tuple) -> list:
+        # sorts the moves so the ones most likely to cause a cutoff are searched first
+        game = self._game
+        killers = self._killers[ply]
+        color = game.current_player
+        history = self._history
+
+        def key(move: tuple) -> int:
+            if move == first:
+                return 1 << 31
+            victim = game.get(*move[1])
+            if victim:
+                return _CAPTURE_ORDER + PIECE_VALUES[type(victim)] * 16 - PIECE_VALUES[type(game.get(*move[0]))] // 100
+            if move == killers[0] or move == killers[1]:
+                return _KILLER_ORDER
+            return history.get((color, move), 0)
+
+        return sorted(moves, key=key, reverse=True)
+
+    def _store_killer(self, move: tuple, ply: int) -> None:
+        # keeps the two most recent quiet cutoff moves of a ply
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def _visit(self) -> None:
+        # counts a node and checks the budget every so often
+        self._nodes += 1
+        if self._stopped:
+            raise _BudgetExceeded
+        if self.node_limit is not None and self._nodes >= self.node_limit:
+            raise _BudgetExceeded
+        if self._nodes & 255 == 0:
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                raise _BudgetExceeded
+            if self.cancel is not None and self.cancel.is_set():
+                raise _BudgetExceeded
@@ -0,0 +1,276 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+from piece_model import Color, Game, Outcome
+from search import Searcher
+from parallel_search import ParallelSearcher
+from transposition import TranspositionTable
+from pgn import game_result, write_pgn
+from opening_book import OpeningBook
+from tablebase import Tablebases
+
+
+class EngineSettings(NamedTuple):
+    """
+    the limits of one engine in a match
+
+    Attributes:
+        name (str): how the engine is called in the report
+        max_depth (int): the deepest iteration it searches
+        time_limit (float): its time per move in seconds, None for no limit
+        node_limit (int): its nodes per move, None for no limit
+        table_mb (float): the size of its transposition table
+        book (str): the opening book file it plays from, None for no book
+        tablebases (str): the directory of the endgame tables it plays from, None for none
+        workers (int): the worker processes of a ParallelSearcher, None to search in the calling process
+    """
+    name: str
+    max_depth: int = 64
+    time_limit: float = None
+    node_limit: int = 5000
+    table_mb: float = 4
+    book: str = None
+    tablebases: str = None
+    workers: int = None
+
+    @classmethod
+    def parse(cls, name: str, text: str) -> 'EngineSettings':
+        """
+        will read settings written as comma separated key=value pairs, such as "depth=3,time=0.5"
+
+        Parameters:
+            name (str): the engine's name
+            text (str): the settings, depth, time, nodes, table, book, tb and workers can be given and time,
+                nodes, book, tb or workers can be none
+
+        Raises:
+            ValueError: when a key is unknown or a value is not a number
+
+        Returns:
+            EngineSettings: the settings, the defaults for the keys that were not given
+        """
+        keys = {"depth": ("max_depth", int), "time": ("time_limit", float), "nodes": ("node_limit", int),
+                "table": ("table_mb", float), "book": ("book", str),
+                "tb": ("tablebases", str), "workers": ("workers", int)}
+        values = {}
+        for pair in filter(None, text.split(",")):
+            key, _, value = pair.partition("=")
+            if key.strip() not in keys:
+                raise ValueError(f"Unknown engine setting {key!r}, use one of {', '.join(keys)}.")
+            field, kind = keys[key.strip()]
+            values[field] = None if value.strip().lower() == "none" else kind(value.strip())
+        return cls(name, **values)
+
+    def searcher(self):
+        """
+        Returns:
+            Searcher: a new searcher with these limits, its book and tables are mapped in the process that calls
+            this. With workers it is a ParallelSearcher, which has no node limit or table size of its own and
+            should be closed when done.
+        """
+        book = OpeningBook(self.book) if self.book else None
+        tablebases = Tablebases(self.tablebases) if self.tablebases else None
+        if self.workers is not None:
+            return ParallelSearcher(self.workers, self.max_depth, self.time_limit, book, tablebases)
+        return Searcher(self.max_depth, self.time_limit, self.node_limit, TranspositionTable(self.table_mb), book,
+                        tablebases)
+
+
+class GameReport(NamedTuple):
+    """
+    how one self-play game went
+
+    Attributes:
+        white (str): the name of the engine that played white
+        black (str): the name of the engine that played black
+        result (str): "1-0", "0-1" or "1/2-1/2", games cut off at the ply limit are draws
+        outcome (str): how the game ended, the name of an Outcome or PLY_LIMIT
+        plies (int): the number of moves played
+        latencies (dict[str,list[float]]): the seconds each engine took for each of its moves
+        nodes (dict[str,int]): the positions each engine searched
+        pgn (str): the game in PGN
+    """
+    white: str
+    black: str
+    result: str
+    outcome: str
+    plies: int
+    latencies: dict
+    nodes: dict
+    pgn: str
+
+
+def play_game(white: EngineSettings, black: EngineSettings, max_plies: int = 200, opening_plies: int = 0,
+              seed: int = 0, backend: str = "pieces") -> GameReport:
+    """
+    will play one game between two engines with Game._computer_move. The first moves can be random, so a series
+    of games between the same deterministic engines does not repeat one game.
+
+    Parameters:
+        white (EngineSettings): the engine playing white
+        black (EngineSettings): the engine playing black
+        max_plies (int): the number of moves after which the game is called a draw
+        opening_plies (int): how many random moves start the game
+        seed (int): the seed of the random opening
+        backend (str): the move generator the game runs on
+
+    Returns:
+        GameReport: the result and the engines' timings
+    """
+    game = Game(backend)
+    engines = {Color.WHITE: (white.name, white.searcher()), Color.BLACK: (black.name, black.searcher())}
+    latencies = {white.name: [], black.name: []}
+    nodes = {white.name: 0, black.name: 0}
+    rng = random.Random(seed)
+    for _ in range(opening_plies):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        (y, x), (y2, x2) = rng.choice(moves)
+        game.move(game.get(y, x), y, x, y2, x2)
+    try:
+        while len(game.move_log()) < max_plies and game.outcome() == Outcome.ONGOING:
+            name, searcher = engines[game.current_player]
+            start = time.perf_counter()
+            result = searcher.search(game)
+            if game._computer_move(result) is None:
+                break
+            latencies[name].append(time.perf_counter() - start)
+            nodes[name] += result.nodes
+    finally:
+        # a parallel searcher's worker processes end with the game
+        for _, searcher in engines.values():
+            if isinstance(searcher, ParallelSearcher):
+                searcher.close()
+    result = game_result(game)
+    outcome = game.outcome().name
+    if result == "*":
+        result, outcome = "1/2-1/2", "PLY_LIMIT"
+    pgn = write_pgn(game, {"Event": "self-play", "Round": str(seed), "White": white.name, "Black": black.name,
+                           "Result": result})
+    return GameReport(white.name, black.name, result, outcome, len(game.move_log()), latencies, nodes, pgn)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    will find a percentile by the nearest rank
+
+    Parameters:
+        values (list[float]): the values, in any order
+        fraction (float): the percentile as a fraction, 0.5 for the median
+
+    Returns:
+        float: the value, 0 when there are none
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_match(first: EngineSettings, second: EngineSettings, games: int = 10, workers: int = None,
+              max_plies: int = 200, opening_plies: int = 4, seed: int = 0, backend: str = "pieces",
+              pgn_path: str = None) -> dict:
+    """
+    will play a match between two engines over a pool of worker processes. The engines swap colors every game and
+    games 2k and 2k + 1 start from the same random opening, so neither engine gets the better openings.
+
+    Parameters:
+        first (EngineSettings): the engine the score is counted for
+        second (EngineSettings): its opponent, it needs a different name
+        games (int): the number of games
+        workers (int): the number of worker processes, one per core when not given
+        max_plies (int): the number of moves after which a game is called a draw
+        opening_plies (int): how many random moves start each game
+        seed (int): the seed of the first game's opening
+        backend (str): the move generator the games run on
+        pgn_path (str): a file the games are written to in PGN, None for no file
+
+    Raises:
+        ValueError: when both engines have the same name
+
+    Returns:
+        dict: the match report, see report_lines
+    """
+    if first.name == second.name:
+        raise ValueError("The two engines need different names.")
+    start = time.perf_counter()
+    pairings = [(first, second) if number % 2 == 0 else (second, first) for number in range(games)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_game, white, black, max_plies, opening_plies, seed + number // 2, backend)
+                   for number, (white, black) in enumerate(pairings)]
+        reports = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    if pgn_path:
+        with open(pgn_path, "w") as file:
+            for report in reports:
+                file.write(report.pgn)
+    wins = draws = losses = 0
+    for report in reports:
+        if report.result == "1/2-1/2":
+            draws += 1
+        elif (report.result == "1-0") == (report.white == first.name):
+            wins += 1
+        else:
+            losses += 1
+    engines = {}
+    for engine in (first, second):
+        latencies = [seconds for report in reports for seconds in report.latencies[engine.name]]
+        nodes = sum(report.nodes[engine.name] for report in reports)
+        engines[engine.name] = {"moves": len(latencies), "p50": percentile(latencies, 0.5),
+                                "p90": percentile(latencies, 0.9), "p99": percentile(latencies, 0.99),
+                                "nodes_per_second": nodes / sum(latencies) if latencies else 0.0}
+    outcomes = {}
+    for report in reports:
+        outcomes[report.outcome] = outcomes.get(report.outcome, 0) + 1
+    return {"games": games, "elapsed": elapsed, "games_per_second": games / elapsed if elapsed else 0.0,
+            "plies": sum(report.plies for report in reports), "wins": wins, "draws": draws, "losses": losses,
+            "outcomes": outcomes, "engines": engines}
+
+
+def report_lines(first: str, report: dict) -> list[str]:
+    """
+    will lay a match report out for printing
+
+    Parameters:
+        first (str): the name of the engine the score is counted for
+        report (dict): the report from run_match
+
+    Returns:
+        list[str]: the lines of the report
+    """
+    lines = [f"{report['games']} games  {report['plies']} plies  {report['elapsed']:.1f} s  "
+             f"{report['games_per_second']:.3f} games/s",
+             f"{first}: +{report['wins']} ={report['draws']} -{report['losses']}  "
+             + "  ".join(f"{name.lower()} {count}" for name, count in sorted(report["outcomes"].items()))]
+    for name, engine in report["engines"].items():
+        lines.append(f"{name:<12} {engine['moves']:>6} moves  latency p50 {engine['p50'] * 1000:7.1f} ms  "
+                     f"p90 {engine['p90'] * 1000:7.1f} ms  p99 {engine['p99'] * 1000:7.1f} ms  "
+                     f"{engine['nodes_per_second']:>8.0f} nodes/s")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play the engine against itself with two sets of limits.")
+    parser.add_argument("--engine-a", default="depth=3",
+                        help="settings of engine a, such as depth=3,time=0.5,book=openings.bin,workers=4")
+    parser.add_argument("--engine-b", default="depth=2", help="settings of engine b")
+    parser.add_argument("--games", type=int, default=10, help="the number of games, colors swap every game")
+    parser.add_argument("--workers", type=int, help="worker processes, one per core by default")
+    parser.add_argument("--max-plies", type=int, default=200, help="moves after which a game is a draw")
+    parser.add_argument("--opening-plies", type=int, default=4, help="random moves at the start of each game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--backend", choices=Game.BACKENDS, default="pieces", help="the move generator to use")
+    parser.add_argument("--pgn", help="write the games to this PGN file")
+    args = parser.parse_args()
+    first = EngineSettings.parse("a", args.engine_a)
+    second = EngineSettings.parse("b", args.engine_b)
+    report = run_match(first, second, args.games, args.workers, args.max_plies, args.opening_plies, args.seed,
+                       args.backend, args.pgn)
+    print("\n".join(report_lines(first.name, report)))
+
+
+if __name__ == '__main__':
+    main()
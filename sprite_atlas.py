@@ -0,0 +1,76 @@
+class SpriteAtlas:
+    """
+    The spritesheet the pieces are drawn from. Nothing is decoded when the atlas is made, the image file is only
+    loaded the first time a sprite is asked for and is then kept for the rest of the process. Every 105x105 sprite
+    cut out of it is memoized as well, so all pieces of the same type and color share a single surface.
+
+    Attributes:
+        _path (str): the file path of the png spritesheet
+        _size (int): the width and height of one sprite in pixels
+        _sheet (pg.Surface): the decoded spritesheet, None until the first sprite is needed
+        _sprites (dict[tuple[int,int], pg.Surface]): sprites that were already cut out, keyed by their x and y
+    """
+
+    def __init__(self, path: str, size: int = 105) -> None:
+        """
+        Constructor for the atlas, it only remembers where the spritesheet is
+
+        Parameters:
+            path (str): the file path of the png spritesheet
+            size (int): the width and height of one sprite in pixels
+        """
+        self._path = path
+        self._size = size
+        self._sheet = None
+        self._sprites: dict = {}
+
+    @property
+    def loaded(self) -> bool:
+        """
+        getter for if the spritesheet has been decoded yet
+
+        Returns:
+            bool: true once the image file has been loaded
+        """
+        return self._sheet is not None
+
+    @property
+    def sheet(self):
+        """
+        getter for the spritesheet, pygame is imported and the file is decoded on the first call
+
+        Returns:
+            _sheet (pg.Surface): the whole spritesheet
+        """
+        if self._sheet is None:
+            # pygame is only needed by whoever draws, so it is not imported until then
+            import pygame as pg
+            self._sheet = pg.image.load(self._path)
+        return self._sheet
+
+    def sprite(self, x: int, y: int):
+        """
+        will return the sprite whose top left corner is at x and y in the spritesheet, the first call for a
+        location copies the chunk into its own surface and later calls return that same surface
+
+        Parameters:
+            x (int): the x coordinate for the sprite in the file
+            y (int): the y coordinate for the sprite in the file
+
+        Returns:
+            sprite (pg.Surface): the size x size sprite
+        """
+        sprite = self._sprites.get((x, y))
+        if sprite is None:
+            import pygame as pg
+            sprite = pg.Surface((self._size, self._size), pg.SRCALPHA)
+            sprite.blit(self.sheet, (0, 0), pg.rect.Rect(x, y, self._size, self._size))
+            self._sprites[(x, y)] = sprite
+        return sprite
+
+    def clear(self) -> None:
+        """
+        drops the decoded spritesheet and every cut out sprite, the next sprite call loads the file again
+        """
+        self._sheet = None
+        self._sprites = {}
@@ -0,0 +1,77 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def time_import(module: str, runs: int) -> list[float]:
+    """
+    will start a fresh interpreter for every run and time how long importing the module takes inside it, so
+    nothing is already cached in sys.modules
+
+    Parameters:
+        module (str): the name of the module to import
+        runs (int): how many fresh interpreters to time
+
+    Returns:
+        times (list[float]): the import time of each run in seconds
+    """
+    code = ("import time\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "print(time.perf_counter() - start)\n")
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip()))
+    return times
+
+
+def time_interpreter(runs: int) -> list[float]:
+    """
+    will time starting and stopping an interpreter that imports nothing, as a baseline for the import times
+
+    Parameters:
+        runs (int): how many interpreters to time
+
+    Returns:
+        times (list[float]): the wall time of each run in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name: str, times: list[float]) -> None:
+    """
+    prints the median, best and worst of a list of times in milliseconds
+
+    Parameters:
+        name (str): the label for the line
+        times (list[float]): the times in seconds
+    """
+    print(f"{name:<24} median {statistics.median(times) * 1000:8.2f} ms   "
+          f"best {min(times) * 1000:8.2f} ms   worst {max(times) * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time how long a fresh process takes to import the chess model.")
+    parser.add_argument("--runs", type=int, default=20, help="fresh interpreters to start per measurement")
+    parser.add_argument("--module", action="append", help="module to time, can be given more than once")
+    args = parser.parse_args()
+    report("interpreter start", time_interpreter(args.runs))
+    for module in args.module or ["piece_model"]:
+        report(f"import {module}", time_import(module, args.runs))
+    # shows that the spritesheet was not touched by the import
+    import piece_model
+    print(f"spritesheet loaded after import: {piece_model.Piece.ATLAS.loaded}")
+
+
+if __name__ == '__main__':
+    main()
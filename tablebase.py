@@ -0,0 +1,383 @@
+import argparse
+import mmap
+import os
+import struct
+from bitboard import KING_ATTACKS, PAWN, ROOK, QUEEN, KING, Bitboards, squares
+from piece_model import Color, Game, PIECE_KINDS
+from search import MATE
+from pgn import square_name
+
+# the endings that can be generated, each is both kings and one piece of the stronger side, and the order they are
+# generated in, since a pawn that promotes leaves KPK for KQK
+ENDINGS = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+ENDING_NAMES = {kind: name for name, kind in ENDINGS.items()}
+# a table file starts with a magic word and a format version, then has one byte for each position
+HEADER = struct.Struct("<4sHH")
+MAGIC = b"LKTB"
+VERSION = 1
+# the positions are indexed by side to move (0 for the stronger side), the stronger king, its piece and the lone
+# king, with the stronger side always white moving up the board, black is mirrored onto white to probe
+SIZE = 2 * 64 * 64 * 64
+# a byte of 0 is a draw or not a position, any other value v means the side to move is mated after v - 1 plies
+# when v - 1 is even and mates after v - 1 plies when it is odd
+DRAW = 0
+
+
+def index(strong_to_move: bool, strong_king: int, piece: int, lone_king: int) -> int:
+    """
+    will find where a position is kept in a table
+
+    Parameters:
+        strong_to_move (bool): if the side with the piece is to move
+        strong_king (int): the square of its king as y * 8 + x
+        piece (int): the square of its piece
+        lone_king (int): the square of the other king
+
+    Returns:
+        int: the position's byte in the table
+    """
+    return (((0 if strong_to_move else 1) * 64 + strong_king) * 64 + piece) * 64 + lone_king
+
+
+def _lone_king_moves(kind: int, strong_king: int, piece: int, lone_king: int) -> tuple[int, bool]:
+    # the number of legal moves of the lone king and if it is in check. The piece is left out of the blockers
+    # when the king steps along its line, and taking the piece is legal when the other king does not guard it
+    guarded = KING_ATTACKS[strong_king] | 1 << strong_king
+    blockers = 1 << strong_king | 1 << piece
+    attacks = Bitboards.attacks_from(piece, kind, Color.WHITE.value, blockers)
+    count = 0
+    for to in squares(KING_ATTACKS[lone_king] & ~guarded):
+        if to == piece or not attacks >> to & 1:
+            count += 1
+    in_check = bool(Bitboards.attacks_from(piece, kind, Color.WHITE.value, blockers | 1 << lone_king)
+                    >> lone_king & 1)
+    return count, in_check
+
+
+def _valid(kind: int, strong_to_move: bool, strong_king: int, piece: int, lone_king: int) -> bool:
+    # three different squares, kings apart, a pawn off the first and last rank, and the side that just moved
+    # not left in check
+    if len({strong_king, piece, lone_king}) < 3 or KING_ATTACKS[strong_king] >> lone_king & 1:
+        return False
+    if kind == PAWN and piece // 8 in (0, 7):
+        return False
+    if strong_to_move:
+        occupied = 1 << strong_king | 1 << piece | 1 << lone_king
+        return not Bitboards.attacks_from(piece, kind, Color.WHITE.value, occupied) >> lone_king & 1
+    return True
+
+
+def _unmoves(kind: int, strong_king: int, piece: int, lone_king: int) -> list[tuple[int, int]]:
+    # the squares the stronger king or piece could have come from, as (king, piece) pairs, for a position the
+    # stronger side just moved into. Nothing was captured, since the lone king is all the other side has
+    occupied = 1 << strong_king | 1 << piece | 1 << lone_king
+    before = [(frm, piece) for frm in squares(KING_ATTACKS[strong_king] & ~occupied)]
+    if kind != PAWN:
+        targets = Bitboards.attacks_from(piece, kind, Color.WHITE.value, occupied) & ~occupied
+        before += [(strong_king, frm) for frm in squares(targets)]
+    elif piece < 48:
+        # white pawns move towards y = 0, from the square below, or two below off their starting rank
+        if not occupied >> (piece + 8) & 1:
+            before.append((strong_king, piece + 8))
+            if piece // 8 == 4 and not occupied >> (piece + 16) & 1:
+                before.append((strong_king, piece + 16))
+    return before
+
+
+def generate(kind: int, promotions: bytes = None) -> bytearray:
+    """
+    will solve an ending by retrograde analysis. Every checkmate is found first, then the search walks backwards
+    one ply at a time: a position the stronger side can move into a lost position from is won, and a position of
+    the lone king is lost once every one of its moves leads to a won position. Positions that are never reached
+    this way are draws. The moves follow this game's rules, so there is no en passant or castling, a pawn moves two
+    squares only from its starting rank and promotes to a queen.
+
+    Parameters:
+        kind (int): the piece of the stronger side, QUEEN, ROOK or PAWN from bitboard
+        promotions (bytes): the solved KQK table, which a promoting pawn moves into, needed for PAWN
+
+    Raises:
+        ValueError: when a pawn ending is generated without the KQK table
+
+    Returns:
+        bytearray: a byte for every index, see DRAW
+    """
+    if kind == PAWN and promotions is None:
+        raise ValueError("A pawn ending needs the KQK table to promote into.")
+    table = bytearray(SIZE)
+    # the moves of each lone king position that are not yet known to lose
+    moves_left = bytearray(SIZE)
+    layers: list[list[int]] = [[] for _ in range(256)]
+    for strong_king in range(64):
+        for piece in range(64):
+            for lone_king in range(64):
+                if not _valid(kind, False, strong_king, piece, lone_king):
+                    continue
+                position = index(False, strong_king, piece, lone_king)
+                count, in_check = _lone_king_moves(kind, strong_king, piece, lone_king)
+                moves_left[position] = count
+                if not count and in_check:
+                    table[position] = 1
+                    layers[0].append(position)
+                # a pawn on the seventh rank can promote into a KQK position that is already solved
+                if kind == PAWN and piece // 8 == 1 and _valid(kind, True, strong_king, piece, lone_king):
+                    to = piece - 8
+                    if to not in (strong_king, lone_king):
+                        value = promotions[index(False, strong_king, to, lone_king)]
+                        if value and (value - 1) % 2 == 0:
+                            layers[value].append(index(True, strong_king, piece, lone_king))
+    for ply in range(255):
+        for position in layers[ply]:
+            side, rest = divmod(position, 64 * 64 * 64)
+            strong_king, rest = divmod(rest, 64 * 64)
+            piece, lone_king = divmod(rest, 64)
+            if side == 0:
+                # the first time a won position comes up is its shortest win
+                if table[position]:
+                    continue
+                table[position] = ply + 1
+                for frm in squares(KING_ATTACKS[lone_king] & ~(1 << strong_king | 1 << piece)):
+                    before = index(False, strong_king, piece, frm)
+                    if table[before] or not moves_left[before] or not _valid(kind, False, strong_king, piece, frm):
+                        continue
+                    moves_left[before] -= 1
+                    if not moves_left[before]:
+                        # the last of its moves to be lost sets how long the lone king holds out
+                        table[before] = ply + 2
+                        layers[ply + 1].append(before)
+            else:
+                for king_from, piece_from in _unmoves(kind, strong_king, piece, lone_king):
+                    before = index(True, king_from, piece_from, lone_king)
+                    if not table[before] and _valid(kind, True, king_from, piece_from, lone_king):
+                        layers[ply + 1].append(before)
+    return table
+
+
+def write_table(path: str, table: bytes) -> None:
+    """
+    will write a solved table to a file
+
+    Parameters:
+        path (str): the file to write
+        table (bytes): the table from generate
+    """
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0))
+        file.write(table)
+
+
+def generate_all(directory: str, progress=None) -> list[str]:
+    """
+    will solve every ending in ENDINGS and write each to a file named after it in a directory
+
+    Parameters:
+        directory (str): where the files go, it is made when missing
+        progress: a function called with each ending's name as it is finished, None for none
+
+    Returns:
+        list[str]: the files written
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    solved = {}
+    for name, kind in ENDINGS.items():
+        solved[name] = generate(kind, solved.get("KQK"))
+        path = os.path.join(directory, name + ".tb")
+        write_table(path, solved[name])
+        paths.append(path)
+        if progress:
+            progress(name)
+    return paths
+
+
+class Tablebases:
+    """
+    The solved endings of a directory, memory mapped so that opening them reads nothing and a probe is a single
+    byte read. A position with both kings and one queen, rook or pawn is probed in the table of its ending, with
+    black mirrored onto white when black has the piece, and a position with only the kings is a draw. Like an
+    opening book, pickled tablebases only carry their directory and map the files again when unpickled.
+
+    Attributes:
+        directory (str): where the tables were read from
+        _files (list): the open table files
+        _maps (dict[int,mmap.mmap]): the mapped table of each piece kind
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Constructor that maps every table found in a directory, endings without a file are not probed
+
+        Parameters:
+            directory (str): where the tables are
+
+        Raises:
+            ValueError: when a file is not a table or has another format version
+        """
+        self.directory = directory
+        self._files = []
+        self._maps = {}
+        for name, kind in ENDINGS.items():
+            path = os.path.join(directory, name + ".tb")
+            if not os.path.exists(path):
+                continue
+            file = open(path, "rb")
+            self._files.append(file)
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, VERSION) or \
+                    os.fstat(file.fileno()).st_size != HEADER.size + SIZE:
+                self.close()
+                raise ValueError(f"{path} is not a version {VERSION} table.")
+            self._maps[kind] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def endings(self) -> list[str]:
+        """
+        getter for the endings that can be probed
+
+        Returns:
+            list[str]: their names, such as KQK
+        """
+        return [ENDING_NAMES[kind] for kind in self._maps]
+
+    def probe(self, game: Game) -> int:
+        """
+        will look the position up in its table
+
+        Parameters:
+            game (Game): the game to probe
+
+        Returns:
+            int: the table's byte for the position, see DRAW, None when no table holds it. A pawn whose first
+            move flag does not match its rank, which this game's Pawn allows, is not held either
+        """
+        white, black = game.get_pieces(Color.WHITE), game.get_pieces(Color.BLACK)
+        if len(white) + len(black) > 3:
+            return None
+        if len(white) == len(black) == 1:
+            return DRAW
+        if len(white) + len(black) != 3:
+            return None
+        strong = Color.WHITE if len(white) == 2 else Color.BLACK
+        # black's pieces are mirrored top to bottom so it plays up the board like white
+        flip = 0 if strong == Color.WHITE else 56
+        strong_king = piece = lone_king = None
+        kind = -1
+        for (y, x), found in game.get_pieces(strong):
+            found_kind = PIECE_KINDS[type(found)]
+            if found_kind == KING:
+                strong_king = (y * 8 + x) ^ flip
+            else:
+                kind, piece = found_kind, (y * 8 + x) ^ flip
+                if kind == PAWN and found.first_move != (piece // 8 == 6):
+                    return None
+        lone = Color.BLACK if strong == Color.WHITE else Color.WHITE
+        for (y, x), found in game.get_pieces(lone):
+            if PIECE_KINDS[type(found)] != KING:
+                return None
+            lone_king = (y * 8 + x) ^ flip
+        if strong_king is None or kind not in self._maps:
+            return None
+        return self._maps[kind][HEADER.size + index(game.current_player == strong, strong_king, piece, lone_king)]
+
+    def score(self, game: Game, ply: int = 0) -> int:
+        """
+        will score the position from its table the way search scores mates, so a win sooner scores more
+
+        Parameters:
+            game (Game): the game to probe
+            ply (int): how many plies the position is from the root of the search
+
+        Returns:
+            int: the score for the side to move, None when no table holds the position
+        """
+        value = self.probe(game)
+        if value is None:
+            return None
+        if value == DRAW:
+            return 0
+        plies = value - 1
+        return MATE - ply - plies if plies % 2 else -MATE + ply + plies
+
+    def best_move(self, game: Game) -> tuple:
+        """
+        will find the move the tables rate best: the quickest mate when winning, the longest defence when losing
+        and any move that keeps the draw otherwise. Each move is played and taken back to probe where it leads.
+
+        Parameters:
+            game (Game): the game to find a move for
+
+        Returns:
+            tuple[tuple[tuple[int,int],tuple[int,int]],int]: the move and its score for the side to move, None
+            when the position or one of the positions it leads to is not in a table, or there is no legal move
+        """
+        if self.probe(game) is None:
+            return None
+        best = None
+        for move in game.legal_moves():
+            (y, x), (y2, x2) = move
+            game.move(game.get(y, x), y, x, y2, x2)
+            try:
+                score = self.score(game, 1)
+            finally:
+                game.undo(False)
+            if score is None:
+                return None
+            if best is None or -score > best[1]:
+                best = (move, -score)
+        return best
+
+    def close(self) -> None:
+        """
+        will unmap and close every table, nothing is probed afterwards
+        """
+        for table in self._maps.values():
+            table.close()
+        for file in self._files:
+            file.close()
+        self._maps = {}
+        self._files = []
+
+    def __enter__(self) -> 'Tablebases':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict:
+        # maps can not be pickled, the other process maps the files itself
+        return {"directory": self.directory}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["directory"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate or probe the endgame tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="solve every ending and write the tables")
+    build.add_argument("directory", help="where the tables are written")
+    probe = commands.add_parser("probe", help="look a position up")
+    probe.add_argument("directory", help="where the tables are")
+    probe.add_argument("fen", help="the position")
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate_all(args.directory, lambda name: print(f"{name} solved"))
+        return
+    game = Game.from_fen(args.fen)
+    with Tablebases(args.directory) as tables:
+        value = tables.probe(game)
+        if value is None:
+            print("not in the tables")
+        elif value == DRAW:
+            print("draw")
+        else:
+            plies = value - 1
+            print(f"{'wins' if plies % 2 else 'loses'}, mate in {plies} plies")
+            best = tables.best_move(game)
+            if best:
+                (frm, to), _ = best
+                print(f"best move {square_name(*frm)}{square_name(*to)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+from typing import NamedTuple
+
+
+class TableEntry(NamedTuple):
+    """
+    what the table remembers about one position
+
+    Attributes:
+        key (int): the position's Zobrist key
+        depth (int): how deep the position was searched
+        score (int): the score that was found
+        flag (int): if the score is EXACT, a LOWER bound or an UPPER bound
+        move: the best move that was found, None if there was none
+        generation (int): the search the entry was stored in
+    """
+    key: int
+    depth: int
+    score: int
+    flag: int
+    move: object
+    generation: int
+
+
+class TranspositionTable:
+    """
+    A fixed size table of searched positions keyed by Zobrist key. The table is split into buckets of two slots:
+    the first keeps the deepest search of the positions that map to the bucket and the second always takes the
+    latest entry. A deep entry left over from an earlier search can be replaced by anything, so the table does
+    not fill up with stale results over a long game.
+
+    The size is worked out from a memory cap, rounded down to a power of two buckets.
+
+    Attributes:
+        _mask (int): the bucket count less one, used to find a key's bucket
+        _slots (list[TableEntry]): two slots per bucket, None when empty
+        _generation (int): the number of the current search
+        probes (int): how many lookups were made
+        hits (int): how many lookups found their position
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+    # rough size of one stored entry in bytes, including the slot that points at it
+    ENTRY_BYTES = 160
+
+    def __init__(self, megabytes: float = 16) -> None:
+        """
+        Constructor for an empty table
+
+        Parameters:
+            megabytes (float): the most memory the table should use
+
+        Raises:
+            ValueError: when the cap is too small for a single bucket
+        """
+        buckets = int(megabytes * 1024 * 1024) // (2 * TranspositionTable.ENTRY_BYTES)
+        if buckets < 1:
+            raise ValueError("The memory cap is too small for a transposition table.")
+        # rounds down to a power of two so a bucket is found with a mask
+        buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = buckets - 1
+        self._slots: list = [None] * (2 * buckets)
+        self._generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def capacity(self) -> int:
+        """
+        getter for the number of entries the table can hold
+
+        Returns:
+            int: two entries per bucket
+        """
+        return len(self._slots)
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: the number of slots that hold an entry
+        """
+        return sum(1 for entry in self._slots if entry is not None)
+
+    def new_search(self) -> None:
+        """
+        marks the start of a new search, deep entries from earlier searches may be replaced from now on
+        """
+        self._generation += 1
+
+    def clear(self) -> None:
+        """
+        removes every entry and resets the counters
+        """
+        self._slots = [None] * len(self._slots)
+        self._generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int) -> TableEntry:
+        """
+        will look a position up
+
+        Parameters:
+            key (int): the position's Zobrist key
+
+        Returns:
+            TableEntry: the stored entry, None when the position is not in the table
+        """
+        self.probes += 1
+        index = (key & self._mask) << 1
+        slots = self._slots
+        entry = slots[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        entry = slots[index + 1]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move=None) -> None:
+        """
+        will remember a searched position. It goes into the depth-preferred slot when that slot is empty, holds
+        the same position, is from an earlier search or was searched less deep, and into the always-replace slot
+        otherwise.
+
+        Parameters:
+            key (int): the position's Zobrist key
+            depth (int): how deep the position was searched
+            score (int): the score that was found
+            flag (int): EXACT, LOWER or UPPER
+            move: the best move, None to keep the move already stored for the position
+        """
+        index = (key & self._mask) << 1
+        slots = self._slots
+        deep = slots[index]
+        if move is None:
+            for old in (deep, slots[index + 1]):
+                if old is not None and old.key == key:
+                    move = old.move
+                    break
+        entry = TableEntry(key, depth, score, flag, move, self._generation)
+        if deep is None or deep.key == key or deep.generation != self._generation or depth >= deep.depth:
+            slots[index] = entry
+        else:
+            slots[index + 1] = entry
+
+    def hit_rate(self) -> float:
+        """
+        Returns:
+            float: the share of lookups that found their position, 0 before any lookup
+        """
+        return self.hits / self.probes if self.probes else 0.0
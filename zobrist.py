@@ -0,0 +1,74 @@
+import random
+from bitboard import PIECE_KINDS, PAWN
+
+
+class ZobristKeys:
+    """
+    The random 64 bit numbers a position's Zobrist key is made of. A key is the exclusive or of one number for
+    every piece on its square, one more for every pawn that still has its first move, and one for black to move,
+    so a move changes it by xoring out what left a square and xoring in what arrived.
+
+    The numbers come from a fixed seed, so every process builds the same keys and keys can be stored on disk.
+
+    Attributes:
+        pieces (list[list[list[int]]]): a number per color value, piece kind and square
+        unmoved (list[int]): a number per square for a pawn that still has its first move
+        side (int): the number for black to move
+        mate (list[int]): a number per color value that turns a position's key into the key of its mate answer
+    """
+
+    def __init__(self, seed: int = 0x1A4E5) -> None:
+        """
+        Constructor that draws every number from a generator with a fixed seed
+
+        Parameters:
+            seed (int): the seed of the generator
+        """
+        rng = random.Random(seed)
+        self.pieces: list[list[list[int]]] = [[[rng.getrandbits(64) for _ in range(64)] for _ in range(6)]
+                                              for _ in range(2)]
+        self.unmoved: list[int] = [rng.getrandbits(64) for _ in range(64)]
+        self.side: int = rng.getrandbits(64)
+        self.mate: list[int] = [rng.getrandbits(64), rng.getrandbits(64)]
+
+    def piece(self, piece, y: int, x: int) -> int:
+        """
+        will return the number for a piece standing on a square, a pawn's first move is part of it
+
+        Parameters:
+            piece (Piece): the piece
+            y (int): the y position of the piece
+            x (int): the x position of the piece
+
+        Returns:
+            int: the piece's part of the key, 0 for an empty square
+        """
+        if not piece:
+            return 0
+        sq = y * 8 + x
+        kind = PIECE_KINDS[type(piece)]
+        key = self.pieces[piece.color.value][kind][sq]
+        if kind == PAWN and piece.first_move:
+            key ^= self.unmoved[sq]
+        return key
+
+    def position(self, board: list[list], black_to_move: bool) -> int:
+        """
+        will work out the key of a whole board
+
+        Parameters:
+            board (list[list]): the board indexed as board[x][y] like Game's
+            black_to_move (bool): if it is black's turn
+
+        Returns:
+            key (int): the Zobrist key of the position
+        """
+        key = self.side if black_to_move else 0
+        for x, col in enumerate(board):
+            for y, piece in enumerate(col):
+                key ^= self.piece(piece, y, x)
+        return key
+
+
+# the keys every game shares
+KEYS = ZobristKeys()